@@ -3,7 +3,7 @@ import pandas as pd
 import json
 import ast
 import csv
-from src.core.pipeline.config import CURRENT_PATCH
+from src.core.pipeline.config import get_current_patch
 
 #CLI: export PYTHONPATH=/home/hatim/data/sourcegit/lol_builds
 
@@ -320,7 +320,7 @@ def main():
     item_mapping = {int(k): v for k, v in item_mapping.items()}
 
     print("Loading item recipe mapping from file...")
-    with open(f"patch_diffs/item_new_{CURRENT_PATCH}.json", "r") as f:
+    with open(f"patch_diffs/item_new_{get_current_patch()}.json", "r") as f:
         full_item_data = json.load(f)
         full_item_data = full_item_data.get("data", {})
 
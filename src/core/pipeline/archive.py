@@ -0,0 +1,177 @@
+# archive.py
+
+import os
+import gzip
+import fcntl
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger()
+
+DEFAULT_ARCHIVE_DIR = "data/archive"
+DEFAULT_SHARD_SIZE = 256 * 1024 * 1024  # compressed bytes per shard before rolling over
+
+def encode_payload(match_id, kind, payload, compresslevel=6):
+    """
+    One archive line for a payload, as (sha1, gzip member). payload is the response body as
+    received (bytes), kept byte for byte apart from line breaks, which JSON only allows as
+    whitespace; a decoded dict is re-encoded. Pure CPU work, run by the parse workers.
+    """
+    if isinstance(payload, (bytes, bytearray)):
+        raw = bytes(payload).replace(b"\r", b" ").replace(b"\n", b" ")
+    else:
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+    sha1 = hashlib.sha1(raw).hexdigest()
+    header = json.dumps({"match_id": match_id, "kind": kind, "sha1": sha1}, separators=(',', ':')).encode()
+    line = header[:-1] + b',"payload":' + raw + b"}\n"
+    return sha1, gzip.compress(line, compresslevel=compresslevel)
+
+class PayloadArchive:
+    """
+    Append-only archive of raw match-v5 payloads (match details and timelines).
+
+    Payloads are written as NDJSON lines into rolling shard files, each line compressed as its
+    own gzip member: a shard reads back sequentially with gzip.open, and a single payload can be
+    decompressed on its own from the (shard, offset, length) kept in a SQLite index keyed by
+    (match_id, kind). Re-archiving a (match_id, kind) with the same SHA-1 is a no-op.
+
+    Several processes may append to one archive: a shard is only written under an exclusive
+    file lock, and the offset is taken under it.
+    """
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR, shard_size=DEFAULT_SHARD_SIZE, compresslevel=6):
+        self.root = root
+        self.shard_size = shard_size
+        self.compresslevel = compresslevel
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, "index.db"), timeout=30, check_same_thread=False)
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive_index (
+            match_id TEXT,
+            kind TEXT,
+            sha1 TEXT,
+            shard TEXT,
+            offset INTEGER,
+            length INTEGER,
+            archived_at REAL,
+            PRIMARY KEY (match_id, kind)
+        )
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_archive_sha1 ON archive_index (sha1)")
+        self.conn.commit()
+        self._shard = self._last_shard()
+
+    def _shard_path(self, shard):
+        return os.path.join(self.root, shard)
+
+    def shards(self):
+        return sorted(name for name in os.listdir(self.root) if name.endswith(".ndjson.gz"))
+
+    def _last_shard(self):
+        shards = self.shards()
+        return shards[-1] if shards else "shard_00000.ndjson.gz"
+
+    def _next_shard(self):
+        number = int(self._shard.split('_')[1].split('.')[0]) + 1
+        return f"shard_{number:05d}.ndjson.gz"
+
+    def append(self, match_id, kind, payload):
+        """
+        Archive one payload (the raw JSON bytes of the response, or a decoded dict).
+        """
+        self.write([(match_id, kind, *encode_payload(match_id, kind, payload, self.compresslevel))])
+
+    def append_match(self, match_id, match_detail, timeline):
+        self.append(match_id, "match", match_detail)
+        if timeline is not None:
+            self.append(match_id, "timeline", timeline)
+
+    def write(self, entries):
+        """
+        Append encoded entries [(match_id, kind, sha1, member), ...] and index them in one commit.
+        """
+        with self._lock:
+            indexed = []
+            for match_id, kind, sha1, member in entries:
+                row = self.conn.execute(
+                    "SELECT sha1 FROM archive_index WHERE match_id = ? AND kind = ?", (match_id, kind)
+                ).fetchone()
+                if row and row[0] == sha1:
+                    continue
+                shard, offset = self._append_member(member)
+                indexed.append((match_id, kind, sha1, shard, offset, len(member), time.time()))
+            if indexed:
+                self.conn.executemany("INSERT OR REPLACE INTO archive_index VALUES (?, ?, ?, ?, ?, ?, ?)", indexed)
+                self.conn.commit()
+
+    def _append_member(self, member):
+        while True:
+            path = self._shard_path(self._shard)
+            with open(path, "ab") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # The end of file as of now, whatever other processes appended before
+                    offset = f.seek(0, os.SEEK_END)
+                    if offset >= self.shard_size:
+                        self._shard = self._next_shard()
+                        continue
+                    f.write(member)
+                    f.flush()
+                    return self._shard, offset
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __contains__(self, key):
+        match_id, kind = key
+        with self._lock:
+            return self.conn.execute(
+                "SELECT 1 FROM archive_index WHERE match_id = ? AND kind = ?", (match_id, kind)
+            ).fetchone() is not None
+
+    def get(self, match_id, kind="match"):
+        """
+        Random access: return the decoded payload for (match_id, kind), or None.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT shard, offset, length FROM archive_index WHERE match_id = ? AND kind = ?", (match_id, kind)
+            ).fetchone()
+        if row is None:
+            return None
+        shard, offset, length = row
+        with open(self._shard_path(shard), "rb") as f:
+            f.seek(offset)
+            member = f.read(length)
+        return json.loads(gzip.decompress(member))["payload"]
+
+    def match_ids(self, kind="match", since=None):
+        """
+        Archived match IDs in archive order, optionally only those archived at or after since (unix time).
+        """
+        query = "SELECT match_id FROM archive_index WHERE kind = ?"
+        params = [kind]
+        if since is not None:
+            query += " AND archived_at >= ?"
+            params.append(since)
+        query += " ORDER BY shard, offset"
+        with self._lock:
+            return [row[0] for row in self.conn.execute(query, params).fetchall()]
+
+    def iter_records(self, kind=None):
+        """
+        Sequential access: yield (match_id, kind, payload) for every archived line, shard by shard.
+        """
+        for shard in self.shards():
+            with gzip.open(self._shard_path(shard), "rb") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if kind is None or record["kind"] == kind:
+                        yield record["match_id"], record["kind"], record["payload"]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,57 @@
+# async_riot_api.py
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from config import REGIONS
+import riot_api
+
+logger = logging.getLogger()
+
+DEFAULT_MAX_IN_FLIGHT = 8
+
+class AsyncRiotClient:
+    """
+    asyncio front-end for riot_api. Each call runs the pooled blocking client on a worker thread,
+    with at most max_in_flight requests outstanding per routing/platform value. The rate limit
+    registry is passed through to call_api, so the app and method budgets still apply.
+    """
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        # One pooled connection per request in flight to a host
+        riot_api.ensure_pool_size(max_in_flight)
+        self._semaphores = {}
+        hosts = {info['routing'] for info in REGIONS.values()} | {info['platform'] for info in REGIONS.values()}
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight * len(hosts), thread_name_prefix="riot-api")
+
+    def _semaphore(self, host):
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphores[host]
+
+    async def _call(self, host, fn, *args, **kwargs):
+        async with self._semaphore(host):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    async def fetch_match_ids_by_puuid(self, region, puuid, start_time, count=20, rate_limits=None):
+        routing = REGIONS[region]['routing']
+        return await self._call(routing, riot_api.fetch_match_ids_by_puuid, region, puuid, start_time, count=count, rate_limits=rate_limits)
+
+    async def list_match_ids_by_puuid(self, region, puuid, start_time=None, limit=None, rate_limits=None):
+        # Pages are sequential (each offset depends on the previous page), so the whole listing runs on one thread
+        routing = REGIONS[region]['routing']
+        return await self._call(routing, riot_api.list_match_ids_by_puuid, region, puuid, start_time, limit=limit, rate_limits=rate_limits)
+
+    async def fetch_match_details(self, region, match_id, rate_limits=None, on_error=None, raw=False):
+        routing = riot_api.get_routing_for_match(match_id, region)
+        return await self._call(routing, riot_api.fetch_match_details, region, match_id, rate_limits=rate_limits, on_error=on_error, raw=raw)
+
+    async def fetch_match_timeline(self, region, match_id, rate_limits=None, event_types=None, on_error=None, raw=False):
+        routing = riot_api.get_routing_for_match(match_id, region)
+        return await self._call(
+            routing, riot_api.fetch_match_timeline, region, match_id, rate_limits=rate_limits, event_types=event_types, on_error=on_error, raw=raw
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=False)
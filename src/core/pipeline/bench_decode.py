@@ -0,0 +1,89 @@
+# bench_decode.py
+#
+# Per-match decode + parse cost: json.loads with the per-participant timeline scan (before) against
+# orjson, the single-pass item event grouping and the streamed timeline decoder.
+#
+#   python src/core/pipeline/bench_decode.py --timeline tests/timeline.json --match data/fixtures/.../NA1_1.json
+
+import json
+import time
+import argparse
+import data_parser
+from fast_decode import loads, orjson
+from timeline_stream import decode_timeline_events
+from data_parser import parse_match_data, EARLY_PHASE_THRESHOLD, MID_PHASE_THRESHOLD
+from replay_server import synthetic_match
+
+def scan_item_events(timeline, participant_id):
+    # The parser before single-pass grouping: the whole timeline scanned once per participant
+    item_events = []
+    for frame in timeline.get("info", {}).get("frames", []):
+        for event in frame.get("events", []):
+            event_type = event.get("type")
+            if event_type in ["ITEM_PURCHASED", "ITEM_SOLD", "ITEM_UNDO", "ITEM_DESTROYED"] and event.get("participantId") == participant_id:
+                timestamp = event.get("timestamp")
+                if timestamp < EARLY_PHASE_THRESHOLD:
+                    phase = "early"
+                elif timestamp < MID_PHASE_THRESHOLD:
+                    phase = "mid"
+                else:
+                    phase = "late"
+                item_events.append({"itemId": event.get("itemId"), "timestamp": timestamp, "phase": phase, "action": event_type})
+    return item_events
+
+def scanned_item_events(timeline):
+    return {participant_id: scan_item_events(timeline, participant_id) for participant_id in range(1, 11)}
+
+def per_match(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark match/timeline decoding and parsing.")
+    parser.add_argument('--timeline', default='tests/timeline.json', help='Timeline payload')
+    parser.add_argument('--match', default=None, help='Match detail payload (synthetic from the timeline if omitted)')
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    with open(args.timeline, "rb") as f:
+        timeline_bytes = f.read()
+    if args.match:
+        with open(args.match, "rb") as f:
+            match_bytes = f.read()
+    else:
+        match_bytes = json.dumps(synthetic_match(json.loads(timeline_bytes), "NA1_1")).encode()
+
+    def before():
+        grouped = data_parser.group_item_events
+        data_parser.group_item_events = scanned_item_events
+        try:
+            parse_match_data(json.loads(match_bytes), json.loads(timeline_bytes))
+        finally:
+            data_parser.group_item_events = grouped
+
+    def stdlib():
+        parse_match_data(json.loads(match_bytes), json.loads(timeline_bytes))
+
+    def fast():
+        parse_match_data(loads(match_bytes), loads(timeline_bytes))
+
+    def streamed():
+        chunks = (timeline_bytes[i:i + 64 * 1024] for i in range(0, len(timeline_bytes), 64 * 1024))
+        parse_match_data(loads(match_bytes), decode_timeline_events(chunks))
+
+    print(f"match {len(match_bytes) / 1024:.0f} KB, timeline {len(timeline_bytes) / 1024:.0f} KB")
+    timeline = json.loads(timeline_bytes)
+    grouped = data_parser.group_item_events(timeline)
+    assert scanned_item_events(timeline) == {participant_id: grouped.get(participant_id, []) for participant_id in range(1, 11)}
+    print(f"before (json.loads + per-participant scan + parse): {per_match(before, args.iterations):.2f} ms/match")
+    print(f"json.loads + parse:        {per_match(stdlib, args.iterations):.2f} ms/match")
+    if orjson is not None:
+        print(f"orjson.loads + parse:      {per_match(fast, args.iterations):.2f} ms/match")
+    else:
+        print("orjson.loads + parse:      orjson not installed")
+    print(f"streamed timeline + parse: {per_match(streamed, args.iterations):.2f} ms/match")
+
+if __name__ == "__main__":
+    main()
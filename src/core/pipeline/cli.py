@@ -2,14 +2,25 @@
 
 import argparse
 import logging
-from src.core.pipeline.config import CURRENT_PATCH, REGIONS
-from src.core.pipeline.pipeline import process_region, RateLimiter
+from src.core.pipeline.config import get_current_patch, set_patch_override, REGIONS, API_KEYS
+from src.core.pipeline.pipeline import process_region, snowball_region, async_process_regions, TimelineGate, MATCHES_PER_PUUID
+from riot_api import configure_session_pool, configure_retry_policy, configure_base_url
+from async_riot_api import DEFAULT_MAX_IN_FLIGHT
+from rate_limiter import KeyPool, SharedRateLimitStore
+from scheduler import FairScheduler, DEFAULT_ETA_INTERVAL
+from telemetry import TELEMETRY, DEFAULT_METRICS_INTERVAL
+from ladder import LadderSeed, DEFAULT_SEED_TIERS, DEFAULT_LADDER_WORKERS, DIVISIONS
+from discovery import TIERS, DEFAULT_DISCOVERY_DIR
+from data_parser import ITEM_EVENT_TYPES
+from archive import PayloadArchive, DEFAULT_ARCHIVE_DIR
+from reingest import reingest_archive
+from writer import configure_writer, close_writer, DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL
+from parse_pool import configure_parse_pool, close_parse_pool, DEFAULT_PARSE_WORKERS, DEFAULT_PARSE_BACKLOG
 import threading
+import asyncio
 from tqdm import tqdm
 import os
 from datetime import datetime
-os.makedirs('logs', exist_ok=True)
-log_filename = datetime.now().strftime('logs/cli_%Y%m%d_%H%M%S.log')
 
 class TqdmLoggingHandler(logging.Handler):
     def __init__(self, level=logging.NOTSET):
@@ -24,41 +35,151 @@ class TqdmLoggingHandler(logging.Handler):
             pass
 
 logger = logging.getLogger()  # Changed to use the root logger
-logger.setLevel(logging.INFO)
-
-handler = TqdmLoggingHandler()
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-
-file_handler = logging.FileHandler(log_filename)
-file_handler.setLevel(logging.INFO)
-file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(file_formatter)
-logger.addHandler(file_handler)
-
-routing_limiters = {}
-for routing in set(region_info['routing'] for region_info in REGIONS.values()):
-    routing_limiters[routing] = {
-        "short": RateLimiter(20, 1),
-        "long": RateLimiter(100, 120)
-    }
+
+def setup_logging():
+    # Not at import: parse pool workers import this module too, and must not open log files
+    os.makedirs('logs', exist_ok=True)
+    log_filename = datetime.now().strftime('logs/cli_%Y%m%d_%H%M%S.log')
+    logger.setLevel(logging.INFO)
+
+    handler = TqdmLoggingHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+    file_handler = logging.FileHandler(log_filename)
+    file_handler.setLevel(logging.INFO)
+    file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler.setFormatter(file_formatter)
+    logger.addHandler(file_handler)
 
 def main():
+    setup_logging()
     parser = argparse.ArgumentParser(description="Process League of Legends match data.")
     parser.add_argument('--regions', nargs='*', default=list(REGIONS.keys()), help='List of regions to process')
-    parser.add_argument('--patch', type=int, default=CURRENT_PATCH, help='Patch start timestamp (Unix time)')
+    parser.add_argument('--patch', type=int, default=None, help='Patch start timestamp (Unix time); older matches are never listed')
+    parser.add_argument('--matches-per-player', type=int, default=MATCHES_PER_PUUID, help='Newest match IDs listed per player; 0 lists every match since --patch (100 per call)')
+    parser.add_argument('--seed-tiers', nargs='*', default=list(DEFAULT_SEED_TIERS), type=str.upper, choices=TIERS, help='Ladder tiers whose players seed the crawl')
+    parser.add_argument('--divisions', nargs='*', default=list(DIVISIONS), choices=DIVISIONS, help='Divisions of the non-apex seed tiers')
+    parser.add_argument('--ladder-workers', type=int, default=DEFAULT_LADDER_WORKERS, help='Ladder pages fetched concurrently per region')
+    parser.add_argument('--snowball-depth', type=int, default=0, help='Discover players breadth-first from match participants, up to this many hops from the ladder seed')
+    parser.add_argument('--min-tier', default=None, choices=TIERS, type=str.upper, help='With --snowball-depth, only crawl discovered players at this tier or above')
+    parser.add_argument('--max-players', type=int, default=None, help='With --snowball-depth, stop after crawling this many players per region')
+    parser.add_argument('--discovery-dir', default=DEFAULT_DISCOVERY_DIR, help='Seen-sets and frontier of the snowball crawl')
+    parser.add_argument('--refresh', action='store_true', help="List matches played since each player's last crawl even when a match ID cache exists")
+    parser.add_argument('--patch-version', default=None, help='Current patch version (e.g. 15.7.1) instead of looking it up on ddragon')
+    parser.add_argument('--pool-size', type=int, default=None, help='Max keep-alive connections per API host (at least --max-in-flight with --async)')
+    parser.add_argument('--no-keep-alive', action='store_true', help='Close the connection after every API call')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Use the asyncio crawler instead of one thread per region')
+    parser.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT, help='Concurrent requests per routing value (--async only)')
+    parser.add_argument('--region-weights', default=None, metavar='REGION=WEIGHT,...', help='Share of its routing budget each region gets while busy (default 1 each), e.g. NA=2,KR=2')
+    parser.add_argument('--eta-interval', type=float, default=DEFAULT_ETA_INTERVAL, help='Seconds between crawl ETA log lines (0 to disable)')
+    parser.add_argument('--metrics-dir', default=None, help='Export API client metrics here (riot_api.prom for Prometheus, riot_api.json)')
+    parser.add_argument('--metrics-interval', type=float, default=DEFAULT_METRICS_INTERVAL, help='Seconds between metrics exports')
+    parser.add_argument('--parse-workers', type=int, default=DEFAULT_PARSE_WORKERS, help='Processes parsing fetched matches; 0 parses in the fetching thread')
+    parser.add_argument('--parse-backlog', type=int, default=DEFAULT_PARSE_BACKLOG, help='Fetched matches waiting for a parser before fetching pauses')
+    parser.add_argument('--write-batch', type=int, default=DEFAULT_BATCH_SIZE, help='Rows committed per database transaction')
+    parser.add_argument('--write-interval', type=float, default=DEFAULT_FLUSH_INTERVAL, help='Seconds a parsed row may wait before its batch is committed')
+    parser.add_argument('--shared-limits', default=None, metavar='DB_PATH', help='SQLite file holding rate limit state shared with other crawler processes on the same key')
+    parser.add_argument('--max-attempts', type=int, default=None, help='Attempts per API call before giving up')
+    parser.add_argument('--request-timeout', type=float, default=None, help='Read timeout in seconds for API calls')
+    parser.add_argument('--breaker-threshold', type=int, default=None, help='Consecutive failures that pause a routing value')
+    parser.add_argument('--breaker-pause', type=float, default=None, help='Seconds a routing value stays paused once its breaker opens')
+    parser.add_argument('--archive', default=None, metavar='DIR', help='Also store raw match and timeline payloads in a compressed archive')
+    parser.add_argument('--lazy-timeline', action='store_true', help='Only fetch a timeline when the match detail passes the cheap filters (duration, queue, patch, lanes)')
+    parser.add_argument('--target-patch', default=None, help='With --lazy-timeline, skip timelines of matches not played on this patch (default: current patch)')
+    parser.add_argument('--stream-timelines', action='store_true', help='Stream-decode timelines keeping only item events (ignored with --archive, which needs the full payload)')
+    parser.add_argument('--base-url', default=None, help='API base URL template, e.g. http://127.0.0.1:8765/{host} for replay_server.py')
+    parser.add_argument('--record', default=None, metavar='DIR', help='Save every successful API response as a replay fixture')
+
+    subparsers = parser.add_subparsers(dest='command')
+    reingest_parser = subparsers.add_parser('reingest', help='Rebuild match_records from the payload archive, offline')
+    reingest_parser.add_argument('--archive', dest='reingest_archive', default=DEFAULT_ARCHIVE_DIR, metavar='DIR', help='Payload archive to read')
+    reingest_parser.add_argument('--db', default='data/matches_reingest.db', help='Database to (re)build; existing matches are skipped, so reruns resume')
+    reingest_parser.add_argument('--workers', type=int, default=None, help='Parser processes (default: all cores)')
+    reingest_parser.add_argument('--since', default=None, help='Only matches archived at or after this date (YYYY-MM-DD) or Unix time')
+    reingest_parser.add_argument('--limit', type=int, default=None, help='Re-ingest at most this many matches')
     args = parser.parse_args()
 
-    threads = []
-    for region in args.regions:
-        logger.info(f"Processing region: {region}")
-        t = threading.Thread(target=process_region, args=(region, routing_limiters), daemon=True)
-        t.start()
-        threads.append(t)
+    if args.command == 'reingest':
+        since = args.since
+        if since is not None:
+            since = float(since) if since.replace('.', '', 1).isdigit() else datetime.fromisoformat(since).timestamp()
+        reingest_archive(args.reingest_archive, args.db, workers=args.workers, since=since, limit=args.limit)
+        return
+
+    if args.patch_version:
+        set_patch_override(args.patch_version)
+    archive = PayloadArchive(args.archive) if args.archive else None
+    timeline_gate = TimelineGate(target_patch=args.target_patch or get_current_patch()) if args.lazy_timeline else None
+    timeline_events = None
+    if args.stream_timelines:
+        if archive is not None:
+            logger.warning("--stream-timelines is ignored with --archive: the archive keeps full timelines.")
+        else:
+            timeline_events = ITEM_EVENT_TYPES
+    matches_per_player = args.matches_per_player or None
+    seed = LadderSeed(args.seed_tiers, args.divisions, max_workers=args.ladder_workers)
+    store = SharedRateLimitStore(args.shared_limits) if args.shared_limits else None
+    # App limits start from the development key budget and are then learned from the response headers.
+    # Each key in RIOT_API_KEYS gets its own budget; calls go to the least-loaded key.
+    rate_limits = KeyPool(API_KEYS or [None], store=store)
+    if len(rate_limits.registries) > 1:
+        logger.info(f"Pooling {len(rate_limits.registries)} API keys.")
+    # Regions on the same routing take turns on its budget, by weight
+    weights = {}
+    for part in (args.region_weights or "").split(','):
+        if part.strip():
+            region, _, weight = part.partition('=')
+            weights[region.strip().upper()] = float(weight)
+    scheduler = FairScheduler(rate_limits, weights)
+    if args.metrics_dir:
+        TELEMETRY.start_exporting(args.metrics_dir, args.metrics_interval)
+    if args.eta_interval:
+        scheduler.start_reporting(args.eta_interval)
+
+    configure_base_url(args.base_url, record_dir=args.record)
+    configure_parse_pool(workers=args.parse_workers, max_pending=args.parse_backlog)
+    configure_writer(batch_size=args.write_batch, flush_interval=args.write_interval)
+    configure_session_pool(pool_maxsize=args.pool_size, keep_alive=False if args.no_keep_alive else None)
+    configure_retry_policy(
+        max_attempts=args.max_attempts,
+        timeout=(3.05, args.request_timeout) if args.request_timeout else None,
+        failure_threshold=args.breaker_threshold,
+        reset_timeout=args.breaker_pause
+    )
+
+    if args.use_async and args.snowball_depth:
+        logger.warning("--async is ignored with --snowball-depth: the snowball crawl runs one thread per region.")
+    if args.use_async and not args.snowball_depth:
+        asyncio.run(async_process_regions(
+            args.regions, scheduler, max_in_flight=args.max_in_flight, archive=archive, timeline_gate=timeline_gate,
+            timeline_events=timeline_events, patch_start=args.patch, refresh=args.refresh, matches_per_player=matches_per_player, seed=seed
+        ))
+    else:
+        threads = []
+        for region in args.regions:
+            logger.info(f"Processing region: {region}")
+            if args.snowball_depth:
+                t = threading.Thread(target=snowball_region, kwargs=dict(
+                    region=region, rate_limits=scheduler.share(region), max_depth=args.snowball_depth, min_tier=args.min_tier,
+                    discovery_dir=args.discovery_dir, archive=archive, timeline_gate=timeline_gate, timeline_events=timeline_events,
+                    patch_start=args.patch, matches_per_player=matches_per_player, max_players=args.max_players, seed=seed
+                ), daemon=True)
+            else:
+                t = threading.Thread(target=process_region, args=(region, scheduler.share(region), archive, timeline_gate, timeline_events, args.patch, args.refresh, matches_per_player, seed), daemon=True)
+            t.start()
+            threads.append(t)
+
+        for t in threads:
+            t.join()
+    close_parse_pool()
+    close_writer()
 
-    for t in threads:
-        t.join()
+    if timeline_gate is not None:
+        logger.info(f"Skipped {timeline_gate.skipped} timeline calls on matches filtered out by their details.")
+    if args.metrics_dir:
+        TELEMETRY.export(args.metrics_dir)
     
     tqdm._instances.clear()
 
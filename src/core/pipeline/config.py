@@ -1,11 +1,22 @@
 # config.py
 from dotenv import load_dotenv
-import requests
 import logging
 import os
+import re
+import json
+import time
+import threading
 load_dotenv(dotenv_path='.env')
+logger = logging.getLogger()
 
 API_KEY = os.getenv('RIOT_API_KEY')
+# Several keys (comma-separated) are pooled, each with its own rate limit budget
+API_KEYS = [key.strip() for key in os.getenv('RIOT_API_KEYS', '').split(',') if key.strip()] or ([API_KEY] if API_KEY else [])
+
+# Point the client at a local stand-in (see replay_server.py), e.g. "http://127.0.0.1:8765/{host}"
+BASE_URL_TEMPLATE = os.getenv('RIOT_API_BASE_URL', "https://{host}.api.riotgames.com")
+# When set, every successful API response is saved under this directory as a replay fixture
+RECORD_DIR = os.getenv('RIOT_API_RECORD_DIR')
 
 # Mapping for regions with platform (for summoner/league endpoints) and routing (for match endpoints)
 REGIONS = {
@@ -24,26 +35,124 @@ REGIONS = {
 # Ranked Solo/Duo queue ID (420)
 RANKED_SOLO_QUEUE_ID = 420
 
-# Define the start of the current patch (Unix timestamp).
-# Update this timestamp at each new patch cycle.
+# Current and previous patch versions, resolved on first use (not at import): an explicit
+# override (RIOT_PATCH / RIOT_PREVIOUS_PATCH or set_patch_override), else ddragon's version
+# list cached on disk for PATCH_CACHE_TTL seconds, else the newest patch with local data in
+# PATCH_DIFFS_DIR, so offline jobs still run.
 PATCH_URL = "https://ddragon.leagueoflegends.com/api/versions.json"
+PATCH_CACHE_PATH = os.getenv('PATCH_CACHE_PATH', 'data/patch_versions.json')
+PATCH_CACHE_TTL = int(os.getenv('PATCH_CACHE_TTL', 6 * 3600))
+PATCH_FETCH_TIMEOUT = 5
+PATCH_DIFFS_DIR = "patch_diffs"
 
-def get_current_previous_patch():
+_patch_override = (None, None)
+_patches = None
+_patches_lock = threading.Lock()
+
+def _version_key(version):
+    return tuple(int(part) for part in version.split('.') if part.isdigit())
+
+def _read_patch_cache():
+    try:
+        with open(PATCH_CACHE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_patch_cache(versions):
+    try:
+        os.makedirs(os.path.dirname(PATCH_CACHE_PATH) or '.', exist_ok=True)
+        tmp_path = f"{PATCH_CACHE_PATH}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"fetched_at": time.time(), "versions": versions}, f)
+        os.replace(tmp_path, PATCH_CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"Could not write patch cache {PATCH_CACHE_PATH}: {e}")
+
+def fetch_patch_versions():
     """
-    Fetches the current patch version from the Riot API.
+    ddragon's version list, newest first: the on-disk copy while it is fresh, else downloaded
+    (and cached), else the stale copy. None when offline without a cache.
     """
+    cached = _read_patch_cache()
+    if cached and time.time() - cached.get("fetched_at", 0) < PATCH_CACHE_TTL:
+        return cached["versions"]
     try:
-        response = requests.get(PATCH_URL)
+        import requests
+        response = requests.get(PATCH_URL, timeout=PATCH_FETCH_TIMEOUT)
         response.raise_for_status()
         versions = response.json()
-        if versions:
-            return versions[0], versions[1]
-        else:
+        if not versions:
             raise ValueError("No versions found in the response.")
-    except requests.RequestException as e:
-        print(f"Error fetching current patch: {e}")
-        return None
-    
-CURRENT_PATCH, PREVIOUS_PATCH = get_current_previous_patch()
-os.environ["CURRENT_PATCH"] = CURRENT_PATCH
-os.environ["PREVIOUS_PATCH"] = PREVIOUS_PATCH
+        _write_patch_cache(versions)
+        return versions
+    except Exception as e:
+        logger.warning(f"Could not fetch patch versions ({e}); falling back to cached or local patch data.")
+        return cached["versions"] if cached else None
+
+def local_patches(patch_diffs_dir=PATCH_DIFFS_DIR):
+    """
+    (current, previous) from the newest *_new_<patch>.json and *_old_<patch>.json in patch_diffs_dir.
+    """
+    found = {"new": set(), "old": set()}
+    if os.path.isdir(patch_diffs_dir):
+        for name in os.listdir(patch_diffs_dir):
+            match = re.match(r".+_(new|old)_(\d+(?:\.\d+)+)\.json$", name)
+            if match:
+                found[match.group(1)].add(match.group(2))
+    newest = lambda versions: max(versions, key=_version_key) if versions else None
+    return newest(found["new"]), newest(found["old"])
+
+def _resolve_patches():
+    current = _patch_override[0] or os.getenv('RIOT_PATCH')
+    previous = _patch_override[1] or os.getenv('RIOT_PREVIOUS_PATCH')
+    if current and previous:
+        return current, previous
+    versions = fetch_patch_versions()
+    if versions:
+        current = current or versions[0]
+        if not previous:
+            index = versions.index(current) if current in versions else 0
+            previous = versions[index + 1] if index + 1 < len(versions) else None
+        return current, previous
+    local_current, local_previous = local_patches()
+    if local_current:
+        logger.info(f"Offline: using patch {local_current} from {PATCH_DIFFS_DIR}.")
+    current = current or local_current
+    if not current:
+        raise RuntimeError("Cannot resolve the current patch: ddragon is unreachable, there is no patch cache and "
+                           f"no patch data in {PATCH_DIFFS_DIR}. Set RIOT_PATCH.")
+    return current, previous or local_previous
+
+def set_patch_override(current_patch, previous_patch=None):
+    """
+    Pin the patch versions for this process (e.g. from a CLI flag), before or after first use.
+    """
+    global _patch_override, _patches
+    with _patches_lock:
+        _patch_override = (current_patch, previous_patch)
+        _patches = None
+
+def get_current_previous_patch():
+    global _patches
+    with _patches_lock:
+        if _patches is None:
+            _patches = _resolve_patches()
+            os.environ["CURRENT_PATCH"] = _patches[0]
+            if _patches[1]:
+                os.environ["PREVIOUS_PATCH"] = _patches[1]
+        return _patches
+
+def get_current_patch():
+    return get_current_previous_patch()[0]
+
+def get_previous_patch():
+    return get_current_previous_patch()[1]
+
+def __getattr__(name):
+    # `from config import CURRENT_PATCH` keeps working, resolving at that point
+    if name == "CURRENT_PATCH":
+        return get_current_patch()
+    if name == "PREVIOUS_PATCH":
+        return get_previous_patch()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,6 +2,31 @@
 
 EARLY_PHASE_THRESHOLD = 600000   # 10 minutes in milliseconds
 MID_PHASE_THRESHOLD = 1500000    # 25 minutes in milliseconds
+MIN_GAME_DURATION = 300          # seconds; shorter games are remakes
+ITEM_EVENT_TYPES = ("ITEM_PURCHASED", "ITEM_SOLD", "ITEM_UNDO", "ITEM_DESTROYED")
+
+def patch_from_game_version(game_version):
+    """
+    Map a match gameVersion ("15.7.671.2108") to the ddragon patch it was played on ("15.7.1").
+    """
+    if not game_version:
+        return None
+    parts = game_version.split(".")
+    if len(parts) < 2:
+        return None
+    return f"{parts[0]}.{parts[1]}.1"
+
+def has_lane_matchup(participants):
+    """
+    True if at least one lane has exactly two players, i.e. parse_match_data can produce a record.
+    """
+    lanes = {}
+    for p in participants:
+        lane = p.get("teamPosition")
+        if lane:
+            lanes[lane] = lanes.get(lane, 0) + 1
+    return any(count == 2 for count in lanes.values())
+
 #TODO: data include runes, summoner spells.
 def parse_match_data(match_detail, timeline):
     """
@@ -9,11 +34,13 @@ def parse_match_data(match_detail, timeline):
     """
     match_info = match_detail.get("info", {})
     game_duration = match_info.get("gameDuration")
-    if game_duration is not None and game_duration < 300:
+    if game_duration is not None and game_duration < MIN_GAME_DURATION:
         # Skip remakes or games that are too short to be meaningful
         return []
 
     participants = match_info.get("participants", [])
+    # One pass over the timeline for all participants instead of one per participant
+    item_events = group_item_events(timeline)
     
     # Build mapping from lane to list of participants (ideally two per lane)
     lane_matchups = {}
@@ -28,6 +55,8 @@ def parse_match_data(match_detail, timeline):
         if len(players) == 2:
             record = {}
             p1, p2 = players
+            challenges_1 = p1.get("challenges", {})
+            challenges_2 = p2.get("challenges", {})
             record["lane"] = lane
             record["champion_1"] = p1.get("championName")
             record["champion_2"] = p2.get("championName")
@@ -37,8 +66,8 @@ def parse_match_data(match_detail, timeline):
             record["kda_raw_2"] = (p2.get("kills"), p2.get("deaths"), p2.get("assists"))
             record["gold_1"] = p1.get("goldEarned")
             record["gold_2"] = p2.get("goldEarned")
-            record["kda_1"] = p1.get("challenges", {}).get("kda")
-            record["kda_2"] = p2.get("challenges", {}).get("kda")
+            record["kda_1"] = challenges_1.get("kda")
+            record["kda_2"] = challenges_2.get("kda")
 
             # Match duration
             record["match_duration"] = game_duration
@@ -78,8 +107,8 @@ def parse_match_data(match_detail, timeline):
             record["largest_killing_spree_2"] = p2.get("largestKillingSpree")
             record["largest_multi_kill_1"] = p1.get("largestMultiKill")
             record["largest_multi_kill_2"] = p2.get("largestMultiKill")
-            record["multikills_1"] = p1.get("challenges", {}).get("multikills")
-            record["multikills_2"] = p2.get("challenges", {}).get("multikills")
+            record["multikills_1"] = challenges_1.get("multikills")
+            record["multikills_2"] = challenges_2.get("multikills")
 
             # Damage profile
             record["physical_damage_dealt_1"] = p1.get("physicalDamageDealtToChampions")
@@ -102,10 +131,10 @@ def parse_match_data(match_detail, timeline):
             # Objectives
             record["turret_takedowns_1"] = p1.get("turretTakedowns")
             record["turret_takedowns_2"] = p2.get("turretTakedowns")
-            record["dragon_takedowns_1"] = p1.get("challenges", {}).get("dragonTakedowns")
-            record["dragon_takedowns_2"] = p2.get("challenges", {}).get("dragonTakedowns")
-            record["baron_takedowns_1"] = p1.get("challenges", {}).get("baronTakedowns")
-            record["baron_takedowns_2"] = p2.get("challenges", {}).get("baronTakedowns")
+            record["dragon_takedowns_1"] = challenges_1.get("dragonTakedowns")
+            record["dragon_takedowns_2"] = challenges_2.get("dragonTakedowns")
+            record["baron_takedowns_1"] = challenges_1.get("baronTakedowns")
+            record["baron_takedowns_2"] = challenges_2.get("baronTakedowns")
 
             # Survivability
             record["longest_time_living_1"] = p1.get("longestTimeSpentLiving")
@@ -132,21 +161,21 @@ def parse_match_data(match_detail, timeline):
             record["first_blood_kill_2"] = p2.get("firstBloodKill")
             record["first_blood_assist_1"] = p1.get("firstBloodAssist")
             record["first_blood_assist_2"] = p2.get("firstBloodAssist")
-            record['takedownsFirst25Minutes_1'] = p1.get("challenges", {}).get("takedownsFirst25Minutes")
-            record['takedownsFirst25Minutes_2'] = p2.get("challenges", {}).get("takedownsFirst25Minutes")
+            record['takedownsFirst25Minutes_1'] = challenges_1.get("takedownsFirst25Minutes")
+            record['takedownsFirst25Minutes_2'] = challenges_2.get("takedownsFirst25Minutes")
 
             # Gold efficiency
-            record["gold_per_minute_1"] = p1.get("challenges", {}).get("goldPerMinute")
-            record["gold_per_minute_2"] = p2.get("challenges", {}).get("goldPerMinute")
-            record['laningPhaseGoldExpAdvantage_1'] = p1.get("challenges", {}).get("laningPhaseGoldExpAdvantage")
-            record['laningPhaseGoldExpAdvantage_2'] = p2.get("challenges", {}).get("laningPhaseGoldExpAdvantage")
-            record['earlyLaningPhaseGoldExpAdvantage_1'] = p1.get("challenges", {}).get("earlyLaningPhaseGoldExpAdvantage")
-            record['earlyLaningPhaseGoldExpAdvantage_2'] = p2.get("challenges", {}).get("earlyLaningPhaseGoldExpAdvantage")
+            record["gold_per_minute_1"] = challenges_1.get("goldPerMinute")
+            record["gold_per_minute_2"] = challenges_2.get("goldPerMinute")
+            record['laningPhaseGoldExpAdvantage_1'] = challenges_1.get("laningPhaseGoldExpAdvantage")
+            record['laningPhaseGoldExpAdvantage_2'] = challenges_2.get("laningPhaseGoldExpAdvantage")
+            record['earlyLaningPhaseGoldExpAdvantage_1'] = challenges_1.get("earlyLaningPhaseGoldExpAdvantage")
+            record['earlyLaningPhaseGoldExpAdvantage_2'] = challenges_2.get("earlyLaningPhaseGoldExpAdvantage")
 
 
             # XP advantage in lane
-            record["xp_diff_per_minute_1"] = p1.get("challenges", {}).get("xpDiffPerMinute")
-            record["xp_diff_per_minute_2"] = p2.get("challenges", {}).get("xpDiffPerMinute")
+            record["xp_diff_per_minute_1"] = challenges_1.get("xpDiffPerMinute")
+            record["xp_diff_per_minute_2"] = challenges_2.get("xpDiffPerMinute")
 
             # Vision metrics
             vision_score_1 = p1.get("visionScore", 0)
@@ -162,14 +191,14 @@ def parse_match_data(match_detail, timeline):
 
             #Jungle
             if lane == "JUNGLE":
-                record['junglerKillsEarlyJungle_1'] = p1.get('challenges', {}).get('junglerKillsEarlyJungle')
-                record['junglerKillsEarlyJungle_2'] = p2.get('challenges', {}).get('junglerKillsEarlyJungle')
-                record['killsOnLanersEarlyJungleAsJungler'] = p1.get('challenges', {}).get('killsOnLanersEarlyJungleAsJungler')
-                record['killsOnLanersEarlyJungleAsJungler_2'] = p2.get('challenges', {}).get('killsOnLanersEarlyJungleAsJungler')
+                record['junglerKillsEarlyJungle_1'] = challenges_1.get('junglerKillsEarlyJungle')
+                record['junglerKillsEarlyJungle_2'] = challenges_2.get('junglerKillsEarlyJungle')
+                record['killsOnLanersEarlyJungleAsJungler'] = challenges_1.get('killsOnLanersEarlyJungleAsJungler')
+                record['killsOnLanersEarlyJungleAsJungler_2'] = challenges_2.get('killsOnLanersEarlyJungleAsJungler')
 
             # Kill participation and other advanced stats
-            record["kill_participation_1"] = p1.get("challenges", {}).get("killParticipation")
-            record["kill_participation_2"] = p2.get("challenges", {}).get("killParticipation")
+            record["kill_participation_1"] = challenges_1.get("killParticipation")
+            record["kill_participation_2"] = challenges_2.get("killParticipation")
             record["cc_score_1"] = p1.get("timeCCingOthers")
             record["cc_score_2"] = p2.get("timeCCingOthers")
             record["gold_spent_1"] = p1.get("goldSpent")
@@ -184,8 +213,8 @@ def parse_match_data(match_detail, timeline):
             record["summoner_spells_2"] = spells_2
 
             # Extract item purchase timeline for each participant
-            record["items_1"] = parse_item_events(timeline, p1.get("participantId"))
-            record["items_2"] = parse_item_events(timeline, p2.get("participantId"))
+            record["items_1"] = item_events.get(p1.get("participantId"), [])
+            record["items_2"] = item_events.get(p2.get("participantId"), [])
 
             matchup_records.append(record)
     return matchup_records
@@ -214,24 +243,31 @@ def parse_item_events(timeline, participant_id):
     Parse timeline events to extract item purchase events for a given participant,
     categorizing them into early, mid, or late game based on the timestamp.
     """
-    item_events = []
+    return group_item_events(timeline).get(participant_id, [])
+
+def group_item_events(timeline):
+    """
+    Item events (ITEM_EVENT_TYPES) for every participant in one pass over the timeline, each
+    tagged early, mid or late by timestamp: {participantId: [event, ...]}.
+    """
+    grouped = {}
     frames = timeline.get("info", {}).get("frames", [])
     for frame in frames:
-        events = frame.get("events", [])
-        for event in events:
+        for event in frame.get("events", []):
             event_type = event.get("type")
-            if event_type in ["ITEM_PURCHASED", "ITEM_SOLD", "ITEM_UNDO", "ITEM_DESTROYED"] and event.get("participantId") == participant_id:
-                timestamp = event.get("timestamp")
-                if timestamp < EARLY_PHASE_THRESHOLD:
-                    phase = "early"
-                elif timestamp < MID_PHASE_THRESHOLD:
-                    phase = "mid"
-                else:
-                    phase = "late"
-                item_events.append({
-                    "itemId": event.get("itemId"),
-                    "timestamp": timestamp,
-                    "phase": phase,
-                    "action": event_type
-                })
-    return item_events
+            if event_type not in ITEM_EVENT_TYPES:
+                continue
+            timestamp = event.get("timestamp")
+            if timestamp < EARLY_PHASE_THRESHOLD:
+                phase = "early"
+            elif timestamp < MID_PHASE_THRESHOLD:
+                phase = "mid"
+            else:
+                phase = "late"
+            grouped.setdefault(event.get("participantId"), []).append({
+                "itemId": event.get("itemId"),
+                "timestamp": timestamp,
+                "phase": phase,
+                "action": event_type
+            })
+    return grouped
@@ -87,12 +87,34 @@ def init_db(db_path="data/matches.db"):
         PRIMARY KEY (match_id, lane)
     )
     ''')
+    # Per-player crawl progress: match IDs starting before last_start_time have been listed
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS puuid_watermarks (
+        puuid TEXT PRIMARY KEY,
+        last_start_time INTEGER NOT NULL,
+        updated_at INTEGER
+    )
+    ''')
+    # Negative cache: matches the API answered with a permanent error (404 ...), never requested again
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS failed_matches (
+        match_id TEXT PRIMARY KEY,
+        status INTEGER,
+        failed_at INTEGER
+    )
+    ''')
+    # Matches whose detail shows they can never yield a record (remakes, no lane matchup), not requested again
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS skipped_matches (
+        match_id TEXT PRIMARY KEY,
+        reason TEXT,
+        skipped_at INTEGER
+    )
+    ''')
     conn.commit()
     return conn
 
-def insert_match_record(conn, record):
-    cursor = conn.cursor()
-    cursor.execute('''
+INSERT_MATCH_RECORD_SQL = '''
     INSERT INTO match_records 
     (match_id, patch_start, region, lane, champion_1, champion_2, win_1, win_2, kda_1, kda_2, gold_1, gold_2, items_1, items_2,
      damage_dealt_1, damage_dealt_2, damage_taken_1, damage_taken_2, damage_to_objectives_1, damage_to_objectives_2,
@@ -107,7 +129,10 @@ def insert_match_record(conn, record):
      match_duration, first_blood_kill_1, first_blood_kill_2, first_blood_assist_1, first_blood_assist_2,ally_champions_1,
      ally_champions_2, enemy_champions_1, enemy_champions_2, runes_1, runes_2, summoner_spells_1, summoner_spells_2)
     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
+    '''
+
+def record_to_row(record):
+    return (
         record.get("match_id"),
         record.get("patch_start"),
         record.get("region"),
@@ -187,5 +212,52 @@ def insert_match_record(conn, record):
         str(record.get("runes_2")),
         str(record.get("summoner_spells_1")),
         str(record.get("summoner_spells_2"))
-    ))
-    conn.commit()
\ No newline at end of file
+    )
+
+# Writers that may see a match twice (several crawler threads) skip lanes already stored
+INSERT_OR_IGNORE_MATCH_RECORD_SQL = INSERT_MATCH_RECORD_SQL.replace("INSERT INTO", "INSERT OR IGNORE INTO", 1)
+
+def insert_match_record(conn, record):
+    cursor = conn.cursor()
+    cursor.execute(INSERT_MATCH_RECORD_SQL, record_to_row(record))
+    conn.commit()
+
+def insert_match_records(conn, records):
+    """
+    Insert many lane records in a single transaction.
+    """
+    cursor = conn.cursor()
+    cursor.executemany(INSERT_MATCH_RECORD_SQL, [record_to_row(record) for record in records])
+    conn.commit()
+
+def get_watermarks(conn):
+    """
+    {puuid: last_start_time} for every player that has been listed before.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT puuid, last_start_time FROM puuid_watermarks")
+    return dict(cursor.fetchall())
+
+SET_WATERMARK_SQL = (
+    "INSERT INTO puuid_watermarks (puuid, last_start_time, updated_at) VALUES (?, ?, ?) "
+    "ON CONFLICT(puuid) DO UPDATE SET last_start_time = MAX(last_start_time, excluded.last_start_time), updated_at = excluded.updated_at"
+)
+
+ADD_FAILED_MATCH_SQL = "INSERT OR REPLACE INTO failed_matches (match_id, status, failed_at) VALUES (?, ?, ?)"
+
+def get_stored_matches(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT match_id FROM match_records")
+    return set(row[0] for row in cursor.fetchall())
+
+def get_failed_matches(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT match_id FROM failed_matches")
+    return set(row[0] for row in cursor.fetchall())
+
+ADD_SKIPPED_MATCH_SQL = "INSERT OR REPLACE INTO skipped_matches (match_id, reason, skipped_at) VALUES (?, ?, ?)"
+
+def get_skipped_matches(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT match_id FROM skipped_matches")
+    return set(row[0] for row in cursor.fetchall())
@@ -0,0 +1,165 @@
+# discovery.py
+
+import os
+import math
+import struct
+import sqlite3
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger()
+
+DEFAULT_DISCOVERY_DIR = "data/discovery"
+DEFAULT_SEEN_CAPACITY = 10_000_000
+DEFAULT_SEEN_ERROR_RATE = 0.01
+
+TIERS = ["IRON", "BRONZE", "SILVER", "GOLD", "PLATINUM", "EMERALD", "DIAMOND", "MASTER", "GRANDMASTER", "CHALLENGER"]
+
+def meets_tier(league_entries, min_tier):
+    """
+    Whether a player's solo queue tier (from league-v4 entries/by-puuid) is min_tier or above.
+    Unranked players never meet it.
+    """
+    for entry in league_entries or []:
+        if entry.get("queueType") == "RANKED_SOLO_5x5" and entry.get("tier") in TIERS:
+            return TIERS.index(entry["tier"]) >= TIERS.index(min_tier.upper())
+    return False
+
+class BloomFilter:
+    """
+    Fixed-size set of strings with no false negatives and about error_rate false positives once
+    capacity items are in: 10M PUUIDs at 1% take 12 MB, where a Python set of them takes GBs.
+    A false positive only means a player or match is skipped.
+    """
+    _HEADER = struct.Struct("<QdQQ")  # capacity, error_rate, hash count, item count
+
+    def __init__(self, capacity=DEFAULT_SEEN_CAPACITY, error_rate=DEFAULT_SEEN_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+    def add(self, item):
+        """
+        Add item; returns True if it was not in the set yet.
+        """
+        positions = self._positions(item)
+        with self._lock:
+            new = False
+            for pos in positions:
+                mask = 1 << (pos & 7)
+                if not self.bits[pos >> 3] & mask:
+                    self.bits[pos >> 3] |= mask
+                    new = True
+            if new:
+                self.count += 1
+            return new
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with self._lock, open(tmp_path, "wb") as f:
+            f.write(self._HEADER.pack(self.capacity, self.error_rate, self.hashes, self.count))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, capacity=DEFAULT_SEEN_CAPACITY, error_rate=DEFAULT_SEEN_ERROR_RATE):
+        """
+        The filter saved at path, or an empty one if there is none. A saved filter keeps its own sizing.
+        """
+        if not os.path.exists(path):
+            return cls(capacity, error_rate)
+        with open(path, "rb") as f:
+            capacity, error_rate, hashes, count = cls._HEADER.unpack(f.read(cls._HEADER.size))
+            bloom = cls(capacity, error_rate)
+            bits = f.read()
+        if hashes != bloom.hashes or len(bits) != len(bloom.bits):
+            raise ValueError(f"Corrupt Bloom filter file: {path}")
+        bloom.bits = bytearray(bits)
+        bloom.count = count
+        if count > capacity:
+            logger.warning(f"{path} holds {count} items for a capacity of {capacity}; false positives are above {error_rate:.0%}.")
+        return bloom
+
+class Frontier:
+    """
+    FIFO queue of (puuid, depth) in SQLite: its size is bounded by disk rather than memory and
+    an interrupted crawl resumes where it stopped. An entry is removed by done(), after the
+    player has been crawled.
+    """
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS frontier (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            puuid TEXT NOT NULL,
+            depth INTEGER NOT NULL
+        )
+        ''')
+        self.conn.commit()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM frontier").fetchone()[0]
+
+    def push_many(self, puuids, depth):
+        self.conn.executemany("INSERT INTO frontier (puuid, depth) VALUES (?, ?)", [(puuid, depth) for puuid in puuids])
+        self.conn.commit()
+
+    def peek(self):
+        """
+        The oldest entry as (id, puuid, depth), or None when the frontier is empty.
+        """
+        return self.conn.execute("SELECT id, puuid, depth FROM frontier ORDER BY id LIMIT 1").fetchone()
+
+    def done(self, entry_id):
+        self.conn.execute("DELETE FROM frontier WHERE id = ?", (entry_id,))
+        self.conn.commit()
+
+    def requeue(self, entry_id):
+        """
+        Move an entry to the back of the queue, e.g. after its crawl failed.
+        """
+        with self.conn:
+            self.conn.execute("INSERT INTO frontier (puuid, depth) SELECT puuid, depth FROM frontier WHERE id = ?", (entry_id,))
+            self.conn.execute("DELETE FROM frontier WHERE id = ?", (entry_id,))
+
+    def close(self):
+        self.conn.close()
+
+class DiscoveryState:
+    """
+    Persistent state of one region's snowball crawl under directory: the players and matches
+    already seen (Bloom filters) and the frontier of players still to crawl.
+    """
+    def __init__(self, region, directory=DEFAULT_DISCOVERY_DIR, capacity=DEFAULT_SEEN_CAPACITY, error_rate=DEFAULT_SEEN_ERROR_RATE):
+        os.makedirs(directory, exist_ok=True)
+        self.players_path = os.path.join(directory, f"{region}_players.bloom")
+        self.matches_path = os.path.join(directory, f"{region}_matches.bloom")
+        self.players = BloomFilter.load(self.players_path, capacity, error_rate)
+        self.matches = BloomFilter.load(self.matches_path, capacity, error_rate)
+        self.frontier = Frontier(os.path.join(directory, f"{region}_frontier.db"))
+
+    def save(self):
+        self.players.save(self.players_path)
+        self.matches.save(self.matches_path)
+
+    def close(self):
+        self.save()
+        self.frontier.close()
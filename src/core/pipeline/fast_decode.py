@@ -0,0 +1,16 @@
+# fast_decode.py
+
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the standard library decoder
+    orjson = None
+
+def loads(data):
+    """
+    Decode a JSON payload (bytes or str) with orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,10 @@
+# fixtures.py
+#
+# Where replay fixtures live on disk, shared by the recording client (riot_api.py) and the
+# replay server (replay_server.py).
+
+import os
+
+def fixture_path(root, host, path):
+    # /lol/match/v5/matches/NA1_1/timeline on americas -> root/americas/lol/match/v5/matches/NA1_1/timeline.json
+    return os.path.join(root, host, *path.strip('/').split('/')) + ".json"
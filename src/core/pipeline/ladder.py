@@ -0,0 +1,80 @@
+# ladder.py
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from riot_api import fetch_league_players, fetch_league_entries_page
+
+logger = logging.getLogger()
+
+APEX_TIERS = ("CHALLENGER", "GRANDMASTER", "MASTER")
+DIVISIONS = ("I", "II", "III", "IV")
+DEFAULT_SEED_TIERS = ("GRANDMASTER",)
+DEFAULT_LADDER_WORKERS = 4
+
+def iter_ladder_entries(region, tiers=DEFAULT_SEED_TIERS, divisions=DIVISIONS, rate_limits=None, max_workers=DEFAULT_LADDER_WORKERS):
+    """
+    Yield the solo queue league entries of every requested tier, as the pages arrive.
+
+    Apex tiers are one call each. Other tiers walk every page of each division: pages of all
+    divisions are fetched concurrently on max_workers threads (each call still waits on the
+    platform's rate limiters), a few pages ahead per division, until a division returns an
+    empty page. A division at most wastes its look-ahead on empty pages past its end.
+    """
+    ladders = [(tier.upper(), division) for tier in tiers if tier.upper() not in APEX_TIERS for division in divisions]
+    lookahead = max(1, max_workers // max(1, len(ladders)))
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"ladder-{region}")
+    pending = {}
+    finished = set()  # divisions whose last page has been seen
+    try:
+        for tier in tiers:
+            if tier.upper() in APEX_TIERS:
+                pending[executor.submit(fetch_league_players, region, tier=tier.upper(), rate_limits=rate_limits)] = (tier.upper(), None, None)
+        for ladder in ladders:
+            for page in range(1, lookahead + 1):
+                pending[executor.submit(fetch_league_entries_page, region, *ladder, page, rate_limits=rate_limits)] = (*ladder, page)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                tier, division, page = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching {tier} {division or ''} page {page} in {region}: {e}")
+                    result = None
+                if division is None:
+                    entries = (result or {}).get("entries", [])
+                else:
+                    entries = result or []
+                    ladder = (tier, division)
+                    if not entries:
+                        # End of the division (or a failed page: stop rather than skip ahead)
+                        finished.add(ladder)
+                    elif ladder not in finished:
+                        next_page = page + lookahead
+                        pending[executor.submit(fetch_league_entries_page, region, tier, division, next_page, rate_limits=rate_limits)] = (tier, division, next_page)
+                yield from entries
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_ladder_puuids(region, tiers=DEFAULT_SEED_TIERS, divisions=DIVISIONS, rate_limits=None, max_workers=DEFAULT_LADDER_WORKERS):
+    # The ladder moves while it is paged, so a player can show up on two pages (or tiers): yield each once
+    seen = set()
+    for entry in iter_ladder_entries(region, tiers, divisions, rate_limits, max_workers):
+        puuid = entry.get('puuid')
+        if puuid and puuid not in seen:
+            seen.add(puuid)
+            yield puuid
+
+class LadderSeed:
+    """
+    Where a crawl starts: the players of the given ladder tiers (and divisions, for non-apex
+    tiers), streamed as their pages arrive. Called as seed(region, rate_limits).
+    """
+    def __init__(self, tiers=DEFAULT_SEED_TIERS, divisions=DIVISIONS, max_workers=DEFAULT_LADDER_WORKERS):
+        self.tiers = tiers
+        self.divisions = divisions
+        self.max_workers = max_workers
+
+    def __call__(self, region, rate_limits=None):
+        return iter_ladder_puuids(region, self.tiers, self.divisions, rate_limits, self.max_workers)
@@ -0,0 +1,178 @@
+# parse_pool.py
+
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from archive import encode_payload
+from data_parser import parse_match_data
+from db import record_to_row
+from fast_decode import loads
+from writer import get_writer
+
+logger = logging.getLogger()
+
+DEFAULT_PARSE_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_PARSE_BACKLOG = 64  # matches handed to the pool and not parsed yet, before fetchers block
+
+def _decoded(payload):
+    # Response bodies arrive as raw bytes; stream-decoded timelines are already dicts
+    return loads(payload) if isinstance(payload, (bytes, bytearray)) else payload
+
+def parse_match_payloads(region, match_id, patch_start, match_detail, timeline, compresslevel=None):
+    """
+    Worker: decode one match's payloads and parse them into database rows. Returns the rows,
+    the match's participant PUUIDs and, with a compresslevel, the payloads encoded for the
+    archive; a match without a timeline is only decoded. Runs in a pool process (or inline).
+    """
+    archived = []
+    if compresslevel is not None:
+        archived.append((match_id, "match", *encode_payload(match_id, "match", match_detail, compresslevel)))
+        if timeline is not None:
+            archived.append((match_id, "timeline", *encode_payload(match_id, "timeline", timeline, compresslevel)))
+    match_detail = _decoded(match_detail)
+    participants = match_detail.get("metadata", {}).get("participants", [])
+    if timeline is None:
+        return [], participants, archived
+    rows = []
+    for record in parse_match_data(match_detail, _decoded(timeline)):
+        record["patch_start"] = patch_start
+        record["region"] = region
+        record["match_id"] = match_id
+        rows.append(record_to_row(record))
+    return rows, participants, archived
+
+class ParsePool:
+    """
+    The parse stage between the fetchers and the writer. Fetch threads hand over the response
+    bodies as received and go back to the network; decoding, parse_match_data and archive
+    compression run in worker processes, off the crawler's GIL, and the rows (and archive
+    lines) go to the writer thread. At most max_pending
+    matches wait for a worker: past that, submit blocks the fetcher, and a full writer queue
+    holds back the pool in turn, so backpressure reaches the API calls. With workers=0 matches
+    are parsed inline by the caller.
+
+    Workers are started by a fork server rather than forked from the crawler, which by then
+    runs many threads (and may hold their locks). If a worker dies (e.g. out of memory), the
+    pool is replaced and the matches it lost are released to be fetched again.
+    """
+    def __init__(self, workers=DEFAULT_PARSE_WORKERS, max_pending=DEFAULT_PARSE_BACKLOG):
+        self.workers = workers
+        self.executor = None
+        if workers:
+            self.executor = self._new_executor()
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.parsed = 0
+        self.failed = 0
+
+    def submit(self, region, match_id, patch_start, match_detail, timeline, archive=None):
+        """
+        Queue a match for parsing (timeline None: detail only, nothing stored), and for archive
+        if given. Returns a Future of the match's participant PUUIDs, None if it could not be
+        parsed.
+        """
+        get_writer().mark_known(match_id)
+        result = Future()
+        args = (region, match_id, patch_start, match_detail, timeline, archive.compresslevel if archive is not None else None)
+        if self.executor is None:
+            try:
+                parsed = parse_match_payloads(*args)
+            except Exception as e:
+                self._failed(match_id, e, result)
+            else:
+                self._store(match_id, parsed, archive, result)
+            return result
+        self._slots.acquire()
+        try:
+            future = self._submit(args)
+        except Exception as e:
+            self._slots.release()
+            get_writer().forget(match_id)
+            self._failed(match_id, e, result)
+            return result
+        future.add_done_callback(lambda done: self._parsed(match_id, done, archive, result))
+        return result
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver"))
+
+    def _submit(self, args):
+        executor = self.executor
+        try:
+            return executor.submit(parse_match_payloads, *args)
+        except BrokenProcessPool as e:
+            self._restart(executor, e)
+            return self.executor.submit(parse_match_payloads, *args)
+
+    def _restart(self, broken, error):
+        with self._executor_lock:
+            # Several fetchers can find the same pool broken; only the first replaces it
+            if self.executor is broken:
+                logger.error(f"Parse pool broken ({error}); starting new workers.")
+                broken.shutdown(wait=False)
+                self.executor = self._new_executor()
+
+    def _parsed(self, match_id, future, archive, result):
+        try:
+            try:
+                parsed = future.result()
+            except BrokenProcessPool as e:
+                # Lost with the worker, not unparseable
+                get_writer().forget(match_id)
+                self._failed(match_id, e, result)
+            except Exception as e:
+                self._failed(match_id, e, result)
+            else:
+                self._store(match_id, parsed, archive, result)
+        finally:
+            self._slots.release()
+
+    def _store(self, match_id, parsed, archive, result):
+        rows, participants, archived = parsed
+        writer = get_writer()
+        writer.put_rows(match_id, rows)
+        if archived:
+            writer.put_archive(archive, archived)
+        self.parsed += 1
+        result.set_result(participants)
+
+    def _failed(self, match_id, error, result):
+        self.failed += 1
+        logger.error(f"Error parsing match {match_id}: {error}")
+        result.set_result(None)
+
+    def close(self):
+        """
+        Wait for every submitted match to be parsed and handed to the writer.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        logger.info(f"Parse pool: {self.parsed} matches parsed, {self.failed} failed.")
+
+_parse_pool_config = {}
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+def configure_parse_pool(workers=None, max_pending=None):
+    """
+    Settings for the pool started by get_parse_pool(); call before the crawl starts.
+    """
+    overrides = {"workers": workers, "max_pending": max_pending}
+    _parse_pool_config.update({key: value for key, value in overrides.items() if value is not None})
+
+def get_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ParsePool(**_parse_pool_config)
+        return _parse_pool
+
+def close_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.close()
+            _parse_pool = None
@@ -2,7 +2,7 @@ import requests
 import json
 from deepdiff import DeepDiff
 import os
-from src.core.pipeline.config import CURRENT_PATCH, PREVIOUS_PATCH
+from src.core.pipeline.config import get_current_patch, get_current_previous_patch
 
 # Base URLs
 BASE_URL = "https://ddragon.leagueoflegends.com/cdn/{patch}/data/en_US/"
@@ -173,7 +173,7 @@ def save_diff(diff, filename, summarized_filename=None, important_summarized_fil
     # Save summarized version if filename provided
     if summarized_filename:
         summaries = {}
-        item_mapping = get_item_mapping(CURRENT_PATCH)
+        item_mapping = get_item_mapping(get_current_patch())
         if 'item' in filename: diff = {k: v for k, v in diff.items() if k in item_mapping}
 
         for name, change in diff.items():
@@ -197,13 +197,15 @@ def save_diff(diff, filename, summarized_filename=None, important_summarized_fil
 def compute_patch_diff(entity_type):
     print(f"Fetching {entity_type} data...")
 
+    current_patch, previous_patch = get_current_previous_patch()
+
     # Define local cache paths
-    old_cache_path = os.path.join(OUTPUT_DIR, f"{entity_type}_old_{PREVIOUS_PATCH}.json")
-    new_cache_path = os.path.join(OUTPUT_DIR, f"{entity_type}_new_{CURRENT_PATCH}.json")
+    old_cache_path = os.path.join(OUTPUT_DIR, f"{entity_type}_old_{previous_patch}.json")
+    new_cache_path = os.path.join(OUTPUT_DIR, f"{entity_type}_new_{current_patch}.json")
 
     # Download old and new data or load from local cache
-    old_data = download_json_or_load_local((CHAMPION_URL if entity_type == "champion" else ITEM_URL).format(patch=PREVIOUS_PATCH), old_cache_path)
-    new_data = download_json_or_load_local((CHAMPION_URL if entity_type == "champion" else ITEM_URL).format(patch=CURRENT_PATCH), new_cache_path)
+    old_data = download_json_or_load_local((CHAMPION_URL if entity_type == "champion" else ITEM_URL).format(patch=previous_patch), old_cache_path)
+    new_data = download_json_or_load_local((CHAMPION_URL if entity_type == "champion" else ITEM_URL).format(patch=current_patch), new_cache_path)
 
     # Focus only on the 'data' field
     old_entities = old_data["data"]
@@ -226,6 +228,7 @@ def compute_patch_diff(entity_type):
     return diffs
 
 def main():
+    current_patch = get_current_patch()
     champion_diffs = compute_patch_diff("champion")
     item_diffs = compute_patch_diff("item")
 
@@ -233,7 +236,7 @@ def main():
     save_diff(item_diffs, "item_patch_diff.json", summarized_filename="item_patch_summary.json", important_summarized_filename="item_patch_important_summary.json")
 
     # Save item mapping separately
-    item_mapping = get_item_mapping(CURRENT_PATCH)
+    item_mapping = get_item_mapping(current_patch)
     with open(os.path.join(OUTPUT_DIR, "item_mapping.json"), "w") as f:
         json.dump(item_mapping, f, indent=2)
 
@@ -243,13 +246,13 @@ def main():
     print(f"Champion tags saved in {champion_tags_path}")
 
     # Save runes mapping
-    runes_mapping = get_runes_mapping(CURRENT_PATCH)
+    runes_mapping = get_runes_mapping(current_patch)
     with open(os.path.join(OUTPUT_DIR, "runes_mapping.json"), "w") as f:
         json.dump(runes_mapping, f, indent=2)
     print("Runes mapping saved.")
 
     # Save summoner spells mapping
-    summoner_spells_mapping = get_summoner_spells_mapping(CURRENT_PATCH)
+    summoner_spells_mapping = get_summoner_spells_mapping(current_patch)
     with open(os.path.join(OUTPUT_DIR, "summoner_spells_mapping.json"), "w") as f:
         json.dump(summoner_spells_mapping, f, indent=2)
     print("Summoner spells mapping saved.")
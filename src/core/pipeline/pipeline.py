@@ -2,135 +2,483 @@
 
 import time
 import logging
-import argparse
+import asyncio
 import threading
-import queue
+from collections import Counter
 from tqdm import tqdm
-from threading import Semaphore, Timer
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from src.core.pipeline.config import CURRENT_PATCH, REGIONS
+from concurrent.futures import ThreadPoolExecutor
+from src.core.pipeline.config import get_current_patch, REGIONS, RANKED_SOLO_QUEUE_ID
+from fast_decode import loads
 from riot_api import (
-    fetch_league_players,
-    fetch_match_ids_by_puuid,
+    list_match_ids_by_puuid,
+    fetch_league_entries_by_puuid,
     fetch_match_details,
-    fetch_match_timeline
+    fetch_match_timeline,
+    PERMANENT_FAILURE_STATUS
 )
-from data_parser import parse_match_data
-from db import init_db, insert_match_record
+from async_riot_api import AsyncRiotClient, DEFAULT_MAX_IN_FLIGHT
+from ladder import LadderSeed
+from discovery import DiscoveryState, meets_tier, DEFAULT_DISCOVERY_DIR
+from data_parser import patch_from_game_version, has_lane_matchup, MIN_GAME_DURATION
+from writer import get_writer
+from parse_pool import get_parse_pool
+from scheduler import FairScheduler
+from singleflight import SingleFlight, AsyncSingleFlight
 import os
 import pickle
 
 logger = logging.getLogger()
 
-def match_exists(conn, match_id):
-    cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM match_records WHERE match_id = ?", (match_id,))
-    return cursor.fetchone() is not None
-
-class RateLimiter:
-    def __init__(self, calls_per_period, period_seconds):
-        self.calls_per_period = calls_per_period
-        self.period_seconds = period_seconds
-        self.call_times = []
-
-    def acquire(self):
-        import time
-        now = time.time()
-        # Remove timestamps older than the current period window
-        self.call_times = [t for t in self.call_times if now - t < self.period_seconds]
-        if len(self.call_times) >= self.calls_per_period:
-            sleep_time = self.period_seconds - (now - self.call_times[0])
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-        self.call_times.append(time.time())
-
-def process_match(region, match_id, short_term_limiter, long_term_limiter):
-    conn = init_db()
+class TimelineGate:
+    """
+    Cheap checks on a match detail that decide whether its timeline is worth an API call:
+    remakes, other queues, matches off the target patch and matches without a lane matchup
+    would be discarded by parse_match_data anyway. predicate(match_detail) can veto more.
+    Only the rejections that hold whatever the run's options (RECORDED_REJECTIONS) are worth
+    remembering; off-patch, queue and predicate rejections depend on this run.
+    """
+    RECORDED_REJECTIONS = ("remake", "no_lane_matchup")
+
+    def __init__(self, target_patch=None, queue_id=RANKED_SOLO_QUEUE_ID, min_duration=MIN_GAME_DURATION, predicate=None):
+        self.target_patch = target_patch
+        self.queue_id = queue_id
+        self.min_duration = min_duration
+        self.predicate = predicate
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, match_detail):
+        return self.rejection(match_detail) is None
+
+    def rejection(self, match_detail):
+        """
+        Why the match's timeline is not needed ("remake", "queue", "patch", "no_lane_matchup",
+        "predicate"), or None if it is.
+        """
+        info = match_detail.get("info", {})
+        reason = None
+        duration = info.get("gameDuration")
+        if duration is not None and duration < self.min_duration:
+            reason = "remake"
+        elif self.queue_id is not None and info.get("queueId", self.queue_id) != self.queue_id:
+            reason = "queue"
+        elif self.target_patch and not self._on_target_patch(info.get("gameVersion")):
+            reason = "patch"
+        elif not has_lane_matchup(info.get("participants", [])):
+            reason = "no_lane_matchup"
+        elif self.predicate is not None and not self.predicate(match_detail):
+            reason = "predicate"
+        if reason is not None:
+            with self._lock:
+                self.skipped += 1
+        return reason
+
+    def _on_target_patch(self, game_version):
+        patch = patch_from_game_version(game_version)
+        # Compare major.minor only: ddragon and the game client disagree on the last component
+        return patch is None or patch.split(".")[:2] == self.target_patch.split(".")[:2]
+
+def store_match(region, match_id, match_detail, timeline, archive=None):
+    """
+    Hand a fetched match (response bodies as received) to the parse stage, whose rows go on to
+    the writer thread. Blocks while the parse pool is full. Returns a Future of the match's
+    participant PUUIDs, or None if the hand-off failed (the region's crawl goes on).
+    """
+    # With an archive, the raw payloads are kept too, so parser changes can be re-run offline
     try:
-        short_term_limiter.acquire()
-        long_term_limiter.acquire()
-        match_detail = fetch_match_details(region, match_id)
+        return get_parse_pool().submit(region, match_id, get_current_patch(), match_detail, timeline, archive)
+    except Exception as e:
+        logger.error(f"Error handing match {match_id} to the parse stage: {e}")
+        return None
+
+def remember_failed_match(match_id, statuses):
+    """
+    Add match_id to the negative cache if its last API error (from on_error) is permanent.
+    """
+    if statuses and statuses[-1] in PERMANENT_FAILURE_STATUS:
+        get_writer().add_failed_match(match_id, statuses[-1])
+
+def skip_timeline(timeline_gate, match_id, match_detail):
+    """
+    True if timeline_gate rejects the match. Rejections that no later run would overturn are
+    recorded, so the match is not fetched again; the rest stay fetchable.
+    """
+    rejection = getattr(timeline_gate, "rejection", None)
+    if rejection is None:
+        return not timeline_gate(match_detail)
+    reason = rejection(match_detail)
+    if reason in getattr(timeline_gate, "RECORDED_REJECTIONS", ()):
+        get_writer().add_skipped_match(match_id, reason)
+    return reason is not None
 
-        short_term_limiter.acquire()
-        long_term_limiter.acquire()
-        timeline = fetch_match_timeline(region, match_id)
+# One in-flight fetch per match ID, shared by every thread asking for it
+MATCH_FLIGHTS = SingleFlight()
+ASYNC_MATCH_FLIGHTS = AsyncSingleFlight()
+# Timelines requested alongside their match detail; one crawling thread per region waits on each
+TIMELINE_FETCHER = ThreadPoolExecutor(max_workers=len(REGIONS), thread_name_prefix="timeline")
+
+def process_match(region, match_id, rate_limits, archive=None, timeline_gate=None, timeline_events=None):
+    """
+    Fetch one match and hand it to the parse stage. Returns a Future of its participant PUUIDs
+    (None if it could not be fetched, is already stored or skipped, or is in the negative cache).
+    Concurrent calls for the same match share one fetch. The detail and timeline are requested
+    together, unless timeline_gate has to see the detail first.
+    """
+    return MATCH_FLIGHTS.do(match_id, _process_match, region, match_id, rate_limits, archive, timeline_gate, timeline_events)
+
+def _process_match(region, match_id, rate_limits, archive=None, timeline_gate=None, timeline_events=None):
+    if get_writer().is_known(match_id):
+        return None
+    errors = []
+    try:
+        if timeline_gate is None:
+            # Both calls in flight at once: the timeline on a helper thread, the detail on this one
+            timeline_errors = []
+            timeline_future = TIMELINE_FETCHER.submit(
+                fetch_match_timeline, region, match_id, rate_limits=rate_limits, event_types=timeline_events, on_error=timeline_errors.append, raw=True
+            )
+            match_detail = fetch_match_details(region, match_id, rate_limits=rate_limits, on_error=errors.append, raw=True)
+            timeline = timeline_future.result()
+            errors += timeline_errors
+        else:
+            match_detail = fetch_match_details(region, match_id, rate_limits=rate_limits, on_error=errors.append, raw=True)
+            # The gate is the one step that needs the detail decoded on this thread
+            if match_detail and skip_timeline(timeline_gate, match_id, loads(match_detail)):
+                return store_match(region, match_id, match_detail, None, archive)
+            timeline = None
+            if match_detail:
+                timeline = fetch_match_timeline(region, match_id, rate_limits=rate_limits, event_types=timeline_events, on_error=errors.append, raw=True)
     except Exception as e:
         logger.error(f"Error fetching match details/timeline for match {match_id}: {e}")
-        conn.close()
         return
 
     if match_detail and timeline:
-        records = parse_match_data(match_detail, timeline)
-        for record in records:
-            record["patch_start"] = CURRENT_PATCH
-            record["region"] = region
-            record["match_id"] = match_id
-            insert_match_record(conn, record)
-    
-    conn.close()
-
-def process_region(region, routing_limiters):
-    conn = init_db()
+        return store_match(region, match_id, match_detail, timeline, archive)
+    remember_failed_match(match_id, errors)
+    return None
+
+def fetch_seed_puuids(region, rate_limits=None, seed=None):
+    seed = seed or LadderSeed()
+    return list(seed(region, rate_limits))
+
+def load_cached_match_ids(region):
     matches_cache_file = f"matches_cache/{region}_matches.pkl"
+    if not os.path.exists(matches_cache_file):
+        return None
+    logger.info(f"Found cached matches file {matches_cache_file}. Loading cached match IDs...")
+    with open(matches_cache_file, "rb") as f:
+        return pickle.load(f)
 
-    routing = REGIONS[region]['routing']
-    short_term_limiter = routing_limiters[routing]['short']
-    long_term_limiter = routing_limiters[routing]['long']
+def save_cached_match_ids(region, unique_match_ids):
+    matches_cache_file = f"matches_cache/{region}_matches.pkl"
+    with open(matches_cache_file, "wb") as f:
+        pickle.dump(unique_match_ids, f)
+    logger.info(f"Saved {len(unique_match_ids)} unique match IDs to {matches_cache_file}")
 
-    if os.path.exists(matches_cache_file):
-        logger.info(f"Found cached matches file {matches_cache_file}. Loading cached match IDs...")
-        with open(matches_cache_file, "rb") as f:
-            unique_match_ids = pickle.load(f)
-    else:
-        #Fetching player IDs
-        tiers = ["GRANDMASTER"]
-        puuids = []
-        for tier in tiers:
-            league_data = fetch_league_players(region, tier=tier)
-            if league_data and 'entries' in league_data:
-                puuids.extend(player['puuid'] for player in league_data['entries'] if 'puuid' in player)
-        if not puuids:
-            logger.info(f"No league data for region: {region}")
-            conn.close()
-            return
-        logger.info(f"Region {region}: Fetched {len(puuids)} PUUIDs.")
+def filter_processed_matches(region, unique_match_ids):
+    # Stored, skipped and permanently failed matches, as the writer knows them (flushed or not)
+    writer = get_writer()
+    matches_to_process = [mid for mid in unique_match_ids if not writer.is_known(mid)]
+    logger.info(f"Region {region}: {len(unique_match_ids) - len(matches_to_process)} matches already processed, skipped or failed permanently.")
+    logger.info(f"Region {region}: {len(matches_to_process)} matches left to process after filtering.")
+    return matches_to_process
+
+MATCHES_PER_PUUID = 5
+# A game still in progress when a player is listed only shows up once it ends, so the next
+# listing of that player starts this many seconds before the current one
+WATERMARK_MARGIN = 3600
+
+def listing_start_time(patch_start, watermark):
+    """
+    startTime for a player's match-ID listing: the patch start, or the player's watermark
+    when it is later. None lists without a lower bound.
+    """
+    candidates = [t for t in (patch_start, watermark) if t is not None]
+    return max(candidates) if candidates else None
 
-        MATCHES_PER_PUUID = 5
-        total_match_requests = len(puuids) * MATCHES_PER_PUUID
-        logger.info(f"Region {region}: Planning to request {total_match_requests} match details ({MATCHES_PER_PUUID} per player).")
+def list_player_match_ids(region, puuid, start_time, rate_limits, matches_per_player=MATCHES_PER_PUUID):
+    """
+    The player's newest matches_per_player match IDs since start_time (all of them if None),
+    listed 100 per call, and whether the listing went through: only then does the watermark move.
+    """
+    listed_at = int(time.time())
+    match_ids, complete = list_match_ids_by_puuid(region, puuid, start_time, limit=matches_per_player, rate_limits=rate_limits)
+    if complete:
+        get_writer().set_watermark(puuid, listed_at - WATERMARK_MARGIN)
+    return match_ids, complete
 
-        #Fetching match IDs
+def process_region(region, rate_limits, archive=None, timeline_gate=None, timeline_events=None, patch_start=None, refresh=False,
+                   matches_per_player=MATCHES_PER_PUUID, seed=None):
+    """
+    Crawl one region. Match IDs come from the region's cache file unless there is none or
+    refresh is set; then each seed player (seed defaults to the Grandmaster ladder) is listed
+    from its watermark (or patch_start) as the ladder pages arrive, so a re-crawl only
+    requests games played since the previous one.
+    """
+    cached_match_ids = load_cached_match_ids(region)
+    unique_match_ids = None if refresh else cached_match_ids
+    if unique_match_ids is None:
+        #Fetching player IDs, listing each player's match IDs as soon as its ladder page arrives
+        seed = seed or LadderSeed()
         all_match_ids = []
-        for puuid in tqdm(puuids, desc=f"Fetching matches for players in {region}"):
+        players = 0
+        already_crawled = 0
+        for puuid in tqdm(seed(region, rate_limits), desc=f"Fetching matches for players in {region}", unit="players"):
+            players += 1
             try:
-                short_term_limiter.acquire()
-                long_term_limiter.acquire()
-                match_ids = fetch_match_ids_by_puuid(region, puuid, CURRENT_PATCH, count=MATCHES_PER_PUUID)
+                watermark = get_writer().get_watermarks([puuid]).get(puuid)
+                already_crawled += watermark is not None
+                start_time = listing_start_time(patch_start, watermark)
+                match_ids, _ = list_player_match_ids(region, puuid, start_time, rate_limits, matches_per_player)
                 # logger.info(f"PUUID {puuid}: Retrieved {len(match_ids)} match IDs.")
                 all_match_ids.extend(match_ids)
             except Exception as e:
                 logger.error(f"Error fetching match IDs for puuid {puuid}: {e}")
                 continue
+        if not players:
+            logger.info(f"No league data for region: {region}")
+            return
+        logger.info(f"Region {region}: Fetched {players} PUUIDs; {already_crawled} already crawled were listed from their watermark.")
 
-        unique_match_ids = list(set(all_match_ids))
+        # Keep IDs of an earlier listing that may not have been processed yet
+        unique_match_ids = list(set(all_match_ids) | set(cached_match_ids or []))
         logger.info(f"Region {region}: {len(unique_match_ids)} unique matches to process out of {len(all_match_ids)}.")
 
         # Save unique match IDs to disk
-        with open(matches_cache_file, "wb") as f:
-            pickle.dump(unique_match_ids, f)
-        logger.info(f"Saved {len(unique_match_ids)} unique match IDs to {matches_cache_file}")
-
-    # Load already processed match IDs
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT match_id FROM match_records")
-    processed_matches = set(row[0] for row in cursor.fetchall())
-    logger.info(f"Region {region}: Found {len(processed_matches)} already processed matches in database.")
-
-    # Filter out already processed matches
-    matches_to_process = [mid for mid in unique_match_ids if mid not in processed_matches]
-    logger.info(f"Region {region}: {len(matches_to_process)} matches left to process after filtering.")
+        save_cached_match_ids(region, unique_match_ids)
+
+    matches_to_process = filter_processed_matches(region, unique_match_ids)
+    if hasattr(rate_limits, "set_backlog"):
+        # Detail + timeline per match
+        rate_limits.set_backlog(2 * len(matches_to_process))
 
     for match_id in tqdm(matches_to_process, desc=f"Processing matches in {region}"):
-        process_match(region, match_id, short_term_limiter, long_term_limiter)
+        process_match(region, match_id, rate_limits, archive, timeline_gate, timeline_events)
 
-    conn.close()
+# Bloom filters are written back every this many crawled players
+DISCOVERY_SAVE_INTERVAL = 50
+# Failed crawls of one player (tier lookup or listing) before the snowball crawl stops for this run
+SNOWBALL_MAX_FAILURES = 3
+
+def player_qualifies(region, puuid, min_tier, rate_limits):
+    """
+    Whether the player's solo queue tier is min_tier or above; None if the lookup failed.
+    """
+    league_entries = fetch_league_entries_by_puuid(region, puuid, rate_limits)
+    return None if league_entries is None else meets_tier(league_entries, min_tier)
+
+def snowball_region(region, rate_limits, max_depth=1, min_tier=None, discovery_dir=DEFAULT_DISCOVERY_DIR, archive=None,
+                    timeline_gate=None, timeline_events=None, patch_start=None, matches_per_player=MATCHES_PER_PUUID, max_players=None,
+                    seed=None):
+    """
+    Breadth-first crawl of a region from the ladder seed: every participant of a crawled
+    player's matches joins the frontier one level deeper, up to max_depth. With min_tier,
+    discovered players are only crawled if their solo queue tier is min_tier or above (one
+    league call each, made when they leave the frontier). Seen players and matches and the
+    frontier persist under discovery_dir, so successive runs keep widening the pool.
+
+    Nothing is marked seen before it went through: a match only once it is fetched (or known to
+    fail for good), and a player whose tier lookup or listing failed goes to the back of the
+    frontier. A player failing SNOWBALL_MAX_FAILURES times stops the crawl, still queued.
+    """
+    writer = get_writer()
+    failures = Counter()
+    state = DiscoveryState(region, discovery_dir)
+    if not len(state.frontier):
+        seeds = [puuid for puuid in fetch_seed_puuids(region, rate_limits, seed) if state.players.add(puuid)]
+        state.frontier.push_many(seeds, 0)
+        logger.info(f"Region {region}: seeded the frontier with {len(seeds)} new ladder players.")
+
+    crawled = 0
+    progress = tqdm(desc=f"Snowball crawl in {region}", unit="players")
+    try:
+        while max_players is None or crawled < max_players:
+            entry = state.frontier.peek()
+            if entry is None:
+                break
+            entry_id, puuid, depth = entry
+            match_ids, listed = [], False
+            try:
+                qualifies = player_qualifies(region, puuid, min_tier, rate_limits) if min_tier and depth > 0 else True
+                if qualifies is False:
+                    state.frontier.done(entry_id)
+                    continue
+                if qualifies:
+                    start_time = listing_start_time(patch_start, writer.get_watermarks([puuid]).get(puuid))
+                    match_ids, listed = list_player_match_ids(region, puuid, start_time, rate_limits, matches_per_player)
+            except Exception as e:
+                logger.error(f"Error listing matches for puuid {puuid}: {e}")
+            parsed = []
+            for match_id in match_ids:
+                if match_id in state.matches or writer.is_known(match_id):
+                    continue
+                participants = process_match(region, match_id, rate_limits, archive, timeline_gate, timeline_events)
+                if participants is not None:
+                    parsed.append(participants)
+                # A transient failure leaves the match unseen, so a later listing retries it
+                if participants is not None or writer.is_known(match_id):
+                    state.matches.add(match_id)
+            if depth < max_depth:
+                # Participants come back from the parse stage; wait for the player's matches at once
+                for participants in parsed:
+                    puuids = participants.result() or []
+                    state.frontier.push_many([p for p in puuids if state.players.add(p)], depth + 1)
+            if not listed:
+                failures[puuid] += 1
+                state.frontier.requeue(entry_id)
+                if failures[puuid] >= SNOWBALL_MAX_FAILURES:
+                    logger.error(f"Region {region}: crawling puuid {puuid} failed {failures[puuid]} times; stopping, the frontier is kept for the next run.")
+                    break
+                continue
+            state.frontier.done(entry_id)
+            crawled += 1
+            progress.update(1)
+            if crawled % DISCOVERY_SAVE_INTERVAL == 0:
+                state.save()
+    finally:
+        progress.close()
+        logger.info(f"Region {region}: crawled {crawled} players; {len(state.players)} seen, {len(state.frontier)} left in the frontier.")
+        state.close()
+
+async def async_process_match(client, region, match_id, rate_limits, archive=None, timeline_gate=None, timeline_events=None):
+    return await ASYNC_MATCH_FLIGHTS.do(
+        match_id, _async_process_match, client, region, match_id, rate_limits, archive, timeline_gate, timeline_events
+    )
+
+async def _async_process_match(client, region, match_id, rate_limits, archive=None, timeline_gate=None, timeline_events=None):
+    if get_writer().is_known(match_id):
+        return
+    errors = []
+    try:
+        if timeline_gate is None:
+            timeline_errors = []
+            match_detail, timeline = await asyncio.gather(
+                client.fetch_match_details(region, match_id, rate_limits=rate_limits, on_error=errors.append, raw=True),
+                client.fetch_match_timeline(region, match_id, rate_limits=rate_limits, event_types=timeline_events, on_error=timeline_errors.append, raw=True)
+            )
+            errors += timeline_errors
+        else:
+            match_detail = await client.fetch_match_details(region, match_id, rate_limits=rate_limits, on_error=errors.append, raw=True)
+            if match_detail and skip_timeline(timeline_gate, match_id, loads(match_detail)):
+                await asyncio.to_thread(store_match, region, match_id, match_detail, None, archive)
+                return
+            timeline = None
+            if match_detail:
+                timeline = await client.fetch_match_timeline(region, match_id, rate_limits=rate_limits, event_types=timeline_events, on_error=errors.append, raw=True)
+    except Exception as e:
+        logger.error(f"Error fetching match details/timeline for match {match_id}: {e}")
+        return
+    if match_detail and timeline:
+        # Off the event loop: waits for room in the parse pool
+        await asyncio.to_thread(store_match, region, match_id, match_detail, timeline, archive)
+    else:
+        remember_failed_match(match_id, errors)
+
+_END = object()
+
+async def iter_in_thread(iterator):
+    """
+    Async iteration over a blocking iterator (e.g. a ladder seed), one next() at a time off the event loop.
+    """
+    iterator = iter(iterator)
+    while (item := await asyncio.to_thread(next, iterator, _END)) is not _END:
+        yield item
+
+async def for_each_bounded(items, handle, concurrency):
+    """
+    await handle(item) for every item of items (an iterable or async iterable) with at most
+    concurrency calls running, pulling the next item only when a call finishes.
+    """
+    pending = asyncio.Queue(maxsize=concurrency)
+
+    async def produce():
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                await pending.put(item)
+        else:
+            for item in items:
+                await pending.put(item)
+        for _ in range(concurrency):
+            await pending.put(_END)
+
+    async def work():
+        while (item := await pending.get()) is not _END:
+            await handle(item)
+
+    tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(work()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def async_process_region(client, region, rate_limits, archive=None, timeline_gate=None, timeline_events=None, patch_start=None, refresh=False,
+                               matches_per_player=MATCHES_PER_PUUID, seed=None):
+    """
+    asyncio counterpart of process_region: seed players are listed as the ladder pages arrive
+    and matches are fetched concurrently, with at most the client's in-flight limit of players
+    or matches outstanding, within the rate limit budgets.
+    """
+    writer = get_writer()
+    cached_match_ids = load_cached_match_ids(region)
+    unique_match_ids = None if refresh else cached_match_ids
+    if unique_match_ids is None:
+        seed = seed or LadderSeed()
+        all_match_ids = []
+        players = 0
+        already_crawled = 0
+        listing = tqdm(desc=f"Fetching matches for players in {region}", unit="players")
+
+        async def list_player(puuid):
+            nonlocal players, already_crawled
+            players += 1
+            try:
+                listed_at = int(time.time())
+                watermark = writer.get_watermarks([puuid]).get(puuid)
+                already_crawled += watermark is not None
+                start_time = listing_start_time(patch_start, watermark)
+                match_ids, complete = await client.list_match_ids_by_puuid(region, puuid, start_time, limit=matches_per_player, rate_limits=rate_limits)
+            except Exception as e:
+                logger.error(f"Error fetching match IDs for puuid {puuid}: {e}")
+                return
+            finally:
+                listing.update(1)
+            if complete:
+                writer.set_watermark(puuid, listed_at - WATERMARK_MARGIN)
+            all_match_ids.extend(match_ids)
+
+        await for_each_bounded(iter_in_thread(seed(region, rate_limits)), list_player, client.max_in_flight)
+        listing.close()
+        if not players:
+            logger.info(f"No league data for region: {region}")
+            return
+        logger.info(f"Region {region}: Fetched {players} PUUIDs; {already_crawled} already crawled were listed from their watermark.")
+        unique_match_ids = list(set(all_match_ids) | set(cached_match_ids or []))
+        logger.info(f"Region {region}: {len(unique_match_ids)} unique matches to process out of {len(all_match_ids)}.")
+        save_cached_match_ids(region, unique_match_ids)
+
+    matches_to_process = filter_processed_matches(region, unique_match_ids)
+    if hasattr(rate_limits, "set_backlog"):
+        rate_limits.set_backlog(2 * len(matches_to_process))
+    progress = tqdm(total=len(matches_to_process), desc=f"Processing matches in {region}")
+
+    async def run(match_id):
+        await async_process_match(client, region, match_id, rate_limits, archive, timeline_gate, timeline_events)
+        progress.update(1)
+
+    await for_each_bounded(matches_to_process, run, client.max_in_flight)
+    progress.close()
+
+async def async_process_regions(regions, rate_limits, max_in_flight=DEFAULT_MAX_IN_FLIGHT, archive=None, timeline_gate=None, timeline_events=None,
+                                patch_start=None, refresh=False, matches_per_player=MATCHES_PER_PUUID, seed=None):
+    client = AsyncRiotClient(max_in_flight=max_in_flight)
+    try:
+        await asyncio.gather(*(
+            async_process_region(
+                client, region, rate_limits.share(region) if isinstance(rate_limits, FairScheduler) else rate_limits,
+                archive, timeline_gate, timeline_events, patch_start, refresh, matches_per_player, seed
+            )
+            for region in regions
+        ))
+    finally:
+        client.close()
@@ -0,0 +1,486 @@
+# rate_limiter.py
+
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger()
+
+# Development key budget; the real budget is learned from response headers.
+DEFAULT_APP_LIMITS = ((20, 1), (100, 120))
+
+# One condition guards every window's state and wait queue, so a caller can take a slot from
+# several windows (app short/long, method) in a single atomic step.
+_condition = threading.Condition()
+
+def canonical_period(period_seconds):
+    """
+    One spelling per window period: 120 and 120.0 (as read back from SQLite) must name the same
+    window, or processes sharing a store would each keep their own call log.
+    """
+    period_seconds = float(period_seconds)
+    return int(period_seconds) if period_seconds.is_integer() else period_seconds
+
+class RateLimiter:
+    """
+    Sliding-window limiter: at most calls_per_period calls in any period_seconds.
+    Safe to share between threads; waiters are served in arrival order.
+    """
+    def __init__(self, calls_per_period, period_seconds):
+        self.calls_per_period = calls_per_period
+        self.period_seconds = period_seconds
+        self.call_times = deque()  # admission times, oldest first
+        self.waiters = deque()     # tickets of callers queued on this window
+        self.store = None          # SharedRateLimitStore holding this window's calls, if any
+
+    def rate_windows(self):
+        return [self]
+
+    def acquire(self):
+        acquire_all((self,))
+
+    def _prune(self, now):
+        # Every timestamp is appended and popped once: amortized O(1) per call
+        while self.call_times and now - self.call_times[0] >= self.period_seconds:
+            self.call_times.popleft()
+
+    def _wait_time(self, now):
+        self._prune(now)
+        excess = len(self.call_times) - self.calls_per_period
+        if excess < 0:
+            return 0
+        # The window frees a slot once the excess+1 oldest calls have expired
+        return self.period_seconds - (now - self.call_times[excess])
+
+    def set_limit(self, calls_per_period):
+        self.calls_per_period = calls_per_period
+
+    def sync_count(self, count):
+        """
+        Catch up with the number of calls the server has counted in the current window,
+        e.g. calls made by another process with the same key.
+        """
+        with _condition:
+            now = time.time()
+            self._prune(now)
+            missing = count - len(self.call_times)
+            if missing > 0:
+                self.call_times.extend([now] * missing)
+
+    def block_until(self, until):
+        with _condition:
+            self.call_times = deque([until - self.period_seconds] * self.calls_per_period)
+
+class _Ticket:
+    __slots__ = ("blocked_on",)
+
+    def __init__(self):
+        self.blocked_on = None  # the window this caller last found full
+
+def _has_turn(ticket, windows):
+    # FIFO only among callers held up by the same window: a caller ahead that waits on another
+    # window (a different method, a penalty) does not hold back callers that could go now
+    for window in windows:
+        for waiter in window.waiters:
+            if waiter is ticket:
+                break
+            if waiter.blocked_on is window:
+                return False
+    return True
+
+def acquire_all(limiters):
+    """
+    Take one slot from every window of every limiter at once, so a caller never holds the
+    short window while blocking on the long one. Callers blocked on the same window are
+    served in arrival order; the others pass them.
+    """
+    windows = list({id(window): window for limiter in limiters for window in limiter.rate_windows()}.values())
+    if not windows:
+        return
+    local_windows = [window for window in windows if window.store is None]
+    shared_windows = {}
+    for window in windows:
+        if window.store is not None:
+            shared_windows.setdefault(window.store, []).append(window)
+    taken_stores = set()
+    ticket = _Ticket()
+    with _condition:
+        for window in windows:
+            window.waiters.append(ticket)
+    try:
+        while True:
+            with _condition:
+                while True:
+                    if not _has_turn(ticket, windows):
+                        _condition.wait()
+                        continue
+                    now = time.time()
+                    wait, blocked_on = 0, None
+                    for window in local_windows:
+                        window_wait = window._wait_time(now)
+                        if window_wait > wait:
+                            wait, blocked_on = window_wait, window
+                    if wait <= 0:
+                        break
+                    if ticket.blocked_on is not blocked_on:
+                        ticket.blocked_on = blocked_on
+                        _condition.notify_all()
+                    _condition.wait(wait)
+                for window in local_windows:
+                    window.call_times.append(now)
+                if not shared_windows:
+                    return
+
+            # Shared windows are checked and charged in one transaction per store, outside the
+            # condition: another process holding the database lock must not stall every limiter here
+            wait, blocked_on = 0, None
+            for store, store_windows in shared_windows.items():
+                if store in taken_stores:
+                    continue
+                wait = store.take(store_windows, time.time())
+                if wait > 0:
+                    blocked_on = store_windows[0]
+                    break
+                taken_stores.add(store)
+            if wait <= 0:
+                return
+            with _condition:
+                # Give the local slots back while waiting for the store
+                for window in local_windows:
+                    if now in window.call_times:
+                        window.call_times.remove(now)
+                ticket.blocked_on = blocked_on
+                _condition.notify_all()
+                _condition.wait(wait)
+    finally:
+        with _condition:
+            for window in windows:
+                window.waiters.remove(ticket)
+            _condition.notify_all()
+
+def parse_rate_limit_header(value):
+    """
+    Parse a Riot rate limit header ("20:1,100:120") into [(calls, seconds), ...].
+    """
+    if not value:
+        return []
+    limits = []
+    for part in value.split(','):
+        calls, _, seconds = part.strip().partition(':')
+        try:
+            limits.append((int(calls), int(seconds)))
+        except ValueError:
+            logger.warning(f"Ignoring malformed rate limit header entry: {part!r}")
+    return limits
+
+class AdaptiveRateLimiter:
+    """
+    A set of RateLimiter windows that follows the limits and counts reported by Riot.
+    header is "X-App-Rate-Limit" or "X-Method-Rate-Limit"; the "-Count" header is used to
+    stay in step with the server when the key is also used elsewhere.
+    """
+    def __init__(self, limits=DEFAULT_APP_LIMITS, header="X-App-Rate-Limit", scope="application", store=None, name=None):
+        self.header = header
+        self.count_header = f"{header}-Count"
+        self.scope = scope
+        self.store = store
+        self.name = name or scope
+        if store is not None:
+            # Start from what another process already learned for this key
+            limits = store.load_limits(self.name) or limits
+        limits = [(calls, canonical_period(period)) for calls, period in limits]
+        self.windows = {period: self._new_window(calls, period) for calls, period in limits}
+        self._pending_limits = None  # limits being applied by update_from_headers
+
+    def _new_window(self, calls, period):
+        if self.store is None:
+            return RateLimiter(calls, period)
+        return SharedWindow(self.store, self.name, calls, period)
+
+    def rate_windows(self):
+        return list(self.windows.values())
+
+    def acquire(self):
+        acquire_all((self,))
+
+    def limits(self):
+        return sorted((window.calls_per_period, period) for period, window in self.windows.items())
+
+    def update_from_headers(self, headers):
+        reported = sorted((calls, canonical_period(period)) for calls, period in parse_rate_limit_header(headers.get(self.header)))
+        if reported:
+            with _condition:
+                # Concurrent responses carry the same header: only the first one rebuilds
+                current = self.limits()
+                if reported == current or reported == self._pending_limits:
+                    reported = None
+                else:
+                    self._pending_limits = reported
+                    windows = dict(self.windows)
+        if reported:
+            logger.info(f"{self.header} changed from {current} to {reported}")
+            try:
+                # Shared windows save their limit to the store (SQLite), so not under the condition
+                updated = {}
+                for calls, period in reported:
+                    window = windows.get(period) or self._new_window(calls, period)
+                    window.set_limit(calls)
+                    updated[period] = window
+            except Exception:
+                with _condition:
+                    self._pending_limits = None
+                raise
+            with _condition:
+                self.windows = updated
+                self._pending_limits = None
+                # Waiters may fit in the new limits
+                _condition.notify_all()
+
+        for count, period in parse_rate_limit_header(headers.get(self.count_header)):
+            window = self.windows.get(canonical_period(period))
+            if window:
+                window.sync_count(count)
+
+    def penalize(self, retry_after):
+        """
+        The server rejected a call for this scope: treat every window as full until retry_after elapses.
+        """
+        until = time.time() + retry_after
+        for window in self.rate_windows():
+            window.block_until(until)
+
+
+class RateLimitRegistry:
+    """
+    The limiters for one API key: an app limiter per routing/platform host and a method
+    limiter per (host, method), created on first use. Riot counts both separately, so league
+    calls on na1 and match calls on americas never share a budget.
+    """
+    def __init__(self, app_limits=DEFAULT_APP_LIMITS, store=None, prefix="", api_key=None):
+        self.app_limits = app_limits
+        self.store = store
+        self.prefix = prefix
+        self.api_key = api_key  # None: config.API_KEY
+        self._app = {}
+        self._methods = {}
+        self._lock = threading.Lock()
+
+    def app(self, host):
+        with self._lock:
+            if host not in self._app:
+                self._app[host] = AdaptiveRateLimiter(
+                    self.app_limits, "X-App-Rate-Limit", scope="application",
+                    store=self.store, name=f"{self.prefix}{host}:app"
+                )
+            return self._app[host]
+
+    def method(self, host, method):
+        with self._lock:
+            if (host, method) not in self._methods:
+                # Method limits differ per endpoint and key; they are learned from the first response
+                self._methods[(host, method)] = AdaptiveRateLimiter(
+                    (), "X-Method-Rate-Limit", scope="method",
+                    store=self.store, name=f"{self.prefix}{host}:{method}"
+                )
+            return self._methods[(host, method)]
+
+    def limiters_for(self, host, method):
+        return (self.app(host), self.method(host, method))
+
+    def select(self, host, method):
+        return self
+
+    def acquire(self, host, limiters):
+        acquire_all(limiters)
+
+    def load(self, host, method):
+        """
+        How full the (host, method) budget is: the fill ratio of the fullest window counting
+        queued callers, or 1 + the wait in seconds while a window is exhausted.
+        Shared windows keep their calls in the store, so only local waiters count for them.
+        """
+        windows = [window for limiter in self.limiters_for(host, method) for window in limiter.rate_windows()]
+        now = time.time()
+        load = 0
+        with _condition:
+            for window in windows:
+                wait = window._wait_time(now) if window.store is None else 0
+                if wait > 0:
+                    load = max(load, 1 + wait)
+                elif window.calls_per_period > 0:
+                    load = max(load, (len(window.call_times) + len(window.waiters)) / window.calls_per_period)
+        return load
+
+class KeyPool:
+    """
+    Several API keys, each with its own RateLimitRegistry (app and method budgets). Every call
+    goes to the active key with the most headroom for its (host, method); a key rejected with
+    401/403 is taken out of rotation. Passed wherever a RateLimitRegistry is accepted.
+    """
+    def __init__(self, api_keys, app_limits=DEFAULT_APP_LIMITS, store=None):
+        if not api_keys:
+            raise ValueError("KeyPool needs at least one API key")
+        self.registries = [
+            # A single key keeps the unprefixed names, so existing shared state still applies
+            RateLimitRegistry(app_limits, store, prefix=self._prefix(api_key) if len(api_keys) > 1 else "", api_key=api_key)
+            for api_key in api_keys
+        ]
+        self.retired = set()
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _prefix(api_key):
+        # Never put the key itself in the shared store
+        return hashlib.sha1((api_key or "").encode()).hexdigest()[:8] + ":"
+
+    def active(self):
+        with self._lock:
+            return [registry for registry in self.registries if id(registry) not in self.retired]
+
+    def select(self, host, method):
+        """
+        The active registry with the lowest load for (host, method), or None once every key is retired.
+        Ties go round-robin so idle keys share the traffic.
+        """
+        active = self.active()
+        if not active:
+            return None
+        with self._lock:
+            start = self._next
+            self._next += 1
+        order = [active[(start + i) % len(active)] for i in range(len(active))]
+        return min(order, key=lambda registry: registry.load(host, method))
+
+    def retire(self, registry, status):
+        """
+        Take a key out of rotation. Returns whether any key is left.
+        """
+        with self._lock:
+            if id(registry) not in self.retired:
+                self.retired.add(id(registry))
+                logger.error(f"API key {registry.prefix or self._prefix(registry.api_key)} rejected with {status}; removed from rotation "
+                             f"({len(self.registries) - len(self.retired)} left).")
+            return len(self.retired) < len(self.registries)
+
+    def limiters_for(self, host, method):
+        registry = self.select(host, method)
+        return registry.limiters_for(host, method) if registry is not None else ()
+
+    def acquire(self, host, limiters):
+        acquire_all(limiters)
+
+class SharedWindow(RateLimiter):
+    """
+    A RateLimiter window whose calls live in a SharedRateLimitStore instead of process memory.
+    """
+    def __init__(self, store, limiter_name, calls_per_period, period_seconds):
+        period_seconds = canonical_period(period_seconds)
+        super().__init__(calls_per_period, period_seconds)
+        self.store = store
+        self.limiter_name = limiter_name
+        self.name = f"{limiter_name}:{period_seconds}"
+        store.save_limit(self)
+
+    def set_limit(self, calls_per_period):
+        self.calls_per_period = calls_per_period
+        self.store.save_limit(self)
+
+    def sync_count(self, count):
+        self.store.sync_count(self, count)
+
+    def block_until(self, until):
+        self.store.block_until(self, until)
+
+class SharedRateLimitStore:
+    """
+    Rate limit windows kept in a SQLite file, so several crawler processes (one per routing,
+    or league and match fetchers) can share one API key's budget. Every check-and-charge runs
+    in a BEGIN IMMEDIATE transaction, which serializes it against the other processes.
+    """
+    def __init__(self, db_path="data/rate_limits.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS rate_limit_windows (
+            window TEXT PRIMARY KEY,
+            limiter TEXT,
+            period_seconds REAL,
+            calls_per_period INTEGER
+        )
+        ''')
+        self.conn.execute("CREATE TABLE IF NOT EXISTS rate_limit_calls (window TEXT, called_at REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limit_calls ON rate_limit_calls (window, called_at)")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    def load_limits(self, limiter_name):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT calls_per_period, period_seconds FROM rate_limit_windows WHERE limiter = ?", (limiter_name,)
+            ).fetchall()
+        return [(calls, canonical_period(period)) for calls, period in rows]
+
+    def save_limit(self, window):
+        with self._transaction() as cursor:
+            cursor.execute(
+                "INSERT OR REPLACE INTO rate_limit_windows VALUES (?, ?, ?, ?)",
+                (window.name, window.limiter_name, canonical_period(window.period_seconds), window.calls_per_period)
+            )
+
+    def take(self, windows, now):
+        """
+        Charge one call to every window if all of them have room; otherwise return the seconds
+        until the fullest one frees a slot.
+        """
+        with self._transaction() as cursor:
+            wait = 0
+            for window in windows:
+                cursor.execute("DELETE FROM rate_limit_calls WHERE window = ? AND called_at <= ?", (window.name, now - window.period_seconds))
+                row = cursor.execute("SELECT calls_per_period FROM rate_limit_windows WHERE window = ?", (window.name,)).fetchone()
+                if row:
+                    window.calls_per_period = row[0]
+                count = cursor.execute("SELECT COUNT(*) FROM rate_limit_calls WHERE window = ?", (window.name,)).fetchone()[0]
+                excess = count - window.calls_per_period
+                if excess >= 0:
+                    oldest = cursor.execute(
+                        "SELECT called_at FROM rate_limit_calls WHERE window = ? ORDER BY called_at LIMIT 1 OFFSET ?",
+                        (window.name, excess)
+                    ).fetchone()[0]
+                    wait = max(wait, window.period_seconds - (now - oldest))
+            if wait <= 0:
+                cursor.executemany("INSERT INTO rate_limit_calls VALUES (?, ?)", [(window.name, now) for window in windows])
+            return wait
+
+    def sync_count(self, window, count):
+        now = time.time()
+        with self._transaction() as cursor:
+            current = cursor.execute(
+                "SELECT COUNT(*) FROM rate_limit_calls WHERE window = ? AND called_at > ?", (window.name, now - window.period_seconds)
+            ).fetchone()[0]
+            if count > current:
+                cursor.executemany("INSERT INTO rate_limit_calls VALUES (?, ?)", [(window.name, now)] * (count - current))
+
+    def block_until(self, window, until):
+        with self._transaction() as cursor:
+            cursor.execute("DELETE FROM rate_limit_calls WHERE window = ?", (window.name,))
+            cursor.executemany(
+                "INSERT INTO rate_limit_calls VALUES (?, ?)",
+                [(window.name, until - window.period_seconds)] * window.calls_per_period
+            )
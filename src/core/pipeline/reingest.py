@@ -0,0 +1,79 @@
+# reingest.py
+
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+from config import REGIONS
+from archive import PayloadArchive
+from data_parser import parse_match_data, patch_from_game_version
+from db import init_db, insert_match_records
+
+logger = logging.getLogger()
+
+PLATFORM_TO_REGION = {info['platform'].upper(): region for region, info in REGIONS.items()}
+
+_worker_archive = None
+
+def region_for_match(match_id):
+    return PLATFORM_TO_REGION.get(match_id.split('_')[0])
+
+def _init_worker(archive_dir):
+    global _worker_archive
+    _worker_archive = PayloadArchive(archive_dir)
+
+def parse_archived_matches(match_ids):
+    """
+    Worker: parse a chunk of archived matches into lane records. Runs in a pool process.
+    """
+    records = []
+    for match_id in match_ids:
+        match_detail = _worker_archive.get(match_id, "match")
+        timeline = _worker_archive.get(match_id, "timeline")
+        if not match_detail or not timeline:
+            continue
+        patch = patch_from_game_version(match_detail.get("info", {}).get("gameVersion"))
+        for record in parse_match_data(match_detail, timeline):
+            record["patch_start"] = patch
+            record["region"] = region_for_match(match_id)
+            record["match_id"] = match_id
+            records.append(record)
+    return len(match_ids), records
+
+def reingest_archive(archive_dir, db_path, workers=None, since=None, limit=None, chunk_size=64):
+    """
+    Rebuild match_records in db_path from the raw payload archive, without any API calls.
+    Matches already present in db_path are skipped, so an interrupted run resumes where it stopped.
+    """
+    archive = PayloadArchive(archive_dir)
+    match_ids = archive.match_ids("match", since=since)
+    archive.close()
+
+    conn = init_db(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    done = set(row[0] for row in conn.execute("SELECT DISTINCT match_id FROM match_records"))
+    match_ids = [mid for mid in match_ids if mid not in done]
+    if limit is not None:
+        match_ids = match_ids[:limit]
+    logger.info(f"Re-ingesting {len(match_ids)} archived matches into {db_path} ({len(done)} already present).")
+
+    chunks = [match_ids[i:i + chunk_size] for i in range(0, len(match_ids), chunk_size)]
+    start = time.time()
+    matches = rows = 0
+    progress = tqdm(total=len(match_ids), desc="Re-ingesting matches")
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker, initargs=(archive_dir,)) as executor:
+        for parsed, records in executor.map(parse_archived_matches, chunks):
+            if records:
+                insert_match_records(conn, records)
+            matches += parsed
+            rows += len(records)
+            progress.update(parsed)
+            progress.set_postfix(matches_per_s=f"{matches / max(time.time() - start, 1e-9):.1f}")
+    progress.close()
+    conn.close()
+
+    elapsed = time.time() - start
+    logger.info(f"Re-ingested {matches} matches ({rows} lane records) in {elapsed:.1f}s: {matches / max(elapsed, 1e-9):.1f} matches/s.")
+    return matches, rows
@@ -0,0 +1,256 @@
+# replay_server.py
+#
+# Local stand-in for the Riot API, for benchmarking and regression-testing the crawler offline.
+#
+#   python src/core/pipeline/replay_server.py --fixtures data/fixtures --latency 80 --p429 0.01
+#   RIOT_API_BASE_URL="http://127.0.0.1:8765/{host}" python src/core/pipeline/cli.py --regions NA
+#
+# Responses come from fixtures recorded with RIOT_API_RECORD_DIR (same directory layout), and
+# fall back to synthetic league / match-id / match payloads and a default timeline
+# (tests/timeline.json) so a full crawl can run without any recordings.
+
+import os
+import json
+import time
+import random
+import hashlib
+import argparse
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from rate_limiter import parse_rate_limit_header
+from fixtures import fixture_path
+
+logger = logging.getLogger()
+
+ROUTING_TO_PLATFORM = {"americas": "NA1", "europe": "EUW1", "asia": "KR", "sea": "OC1"}
+POSITIONS = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
+
+def method_for(path):
+    # Group paths the way Riot groups method rate limits
+    if "/by-puuid/" in path:
+        return "match-v5.getMatchIdsByPUUID"
+    if path.startswith("/lol/match/v5/matches/"):
+        return "match-v5.getTimeline" if path.endswith("/timeline") else "match-v5.getMatch"
+    return '/'.join(path.strip('/').split('/')[:4])
+
+def synthetic_match(timeline, match_id, game_version="15.7.671.1"):
+    """
+    A ranked match detail consistent with a recorded timeline (same participants and duration).
+    """
+    frames = timeline["info"]["frames"]
+    participants = []
+    for p in timeline["info"]["participants"]:
+        pid = p["participantId"]
+        participants.append({
+            "participantId": pid,
+            "puuid": p["puuid"],
+            "teamId": 100 if pid <= 5 else 200,
+            "teamPosition": POSITIONS[(pid - 1) % 5],
+            "championName": f"Champion{pid}",
+            "win": pid <= 5,
+            "challenges": {},
+            "firstBloodKill": False,
+            "firstBloodAssist": False,
+            "perks": {"styles": []},
+        })
+    return {
+        "metadata": {"matchId": match_id, "participants": [p["puuid"] for p in participants]},
+        "info": {
+            "gameDuration": frames[-1]["timestamp"] // 1000,
+            "gameStartTimestamp": int(time.time() * 1000) - 3600 * 1000,
+            "gameVersion": game_version,
+            "queueId": 420,
+            "participants": participants,
+        },
+    }
+
+class FixedWindowCounter:
+    """
+    Riot-style fixed windows: a window starts with its first call and resets period seconds later.
+    """
+    def __init__(self, limits):
+        self.limits = limits
+        self.windows = {}  # period -> [window_start, count]
+        self._lock = threading.Lock()
+
+    def hit(self):
+        """
+        Count one call; return (counts header value, seconds to wait if over the limit else 0).
+        """
+        now = time.time()
+        retry_after = 0
+        with self._lock:
+            for calls, period in self.limits:
+                start, count = self.windows.get(period, (now, 0))
+                if now - start >= period:
+                    start, count = now, 0
+                count += 1
+                self.windows[period] = (start, count)
+                if count > calls:
+                    retry_after = max(retry_after, period - (now - start))
+            counts = ",".join(f"{self.windows[period][1]}:{period}" for _, period in self.limits)
+        return counts, retry_after
+
+class ReplayState:
+    def __init__(self, args):
+        self.fixtures = args.fixtures
+        self.latency = args.latency / 1000
+        self.jitter = args.jitter
+        self.p429 = args.p429
+        self.p5xx = args.p5xx
+        self.retry_after = args.retry_after
+        self.league_size = args.league_size
+        self.game_version = args.game_version
+        self.history_size = args.history_size
+        self.league_pages = args.league_pages
+        self.app_limit_header = args.app_limits
+        self.method_limit_header = args.method_limits
+        self.app_limits = parse_rate_limit_header(args.app_limits)
+        self.method_limits = parse_rate_limit_header(args.method_limits)
+        self.random = random.Random(args.seed)
+        self._random_lock = threading.Lock()
+        self.counters = {}
+        self._counters_lock = threading.Lock()
+        with open(args.timeline, "rb") as f:
+            self.timeline_bytes = f.read()
+        self.timeline = json.loads(self.timeline_bytes)
+
+    def roll(self):
+        with self._random_lock:
+            return self.random.random()
+
+    def counter(self, key, limits):
+        with self._counters_lock:
+            if key not in self.counters:
+                self.counters[key] = FixedWindowCounter(limits)
+            return self.counters[key]
+
+    def synthetic(self, host, path, query):
+        """
+        Build a response body for an endpoint without a recorded fixture, or None for a 404.
+        """
+        parts = path.strip('/').split('/')
+        if path.startswith("/lol/league/v4/") and "leagues" in parts[3]:
+            return {"entries": [{"puuid": f"replay-{host}-{i}"} for i in range(self.league_size)]}
+        if path.startswith("/lol/league/v4/entries/by-puuid/"):
+            return [{"queueType": "RANKED_SOLO_5x5", "tier": "DIAMOND", "rank": "I", "puuid": parts[-1]}]
+        if path.startswith("/lol/league/v4/entries/"):
+            page = int(query.get("page", ["1"])[0])
+            if page > self.league_pages:
+                return []
+            return [{"puuid": f"replay-{host}-{parts[-2]}-{parts[-1]}-{page}-{i}"} for i in range(self.league_size)]
+        if path.startswith("/lol/match/v5/matches/by-puuid/"):
+            puuid = parts[5]
+            count = int(query.get("count", ["20"])[0])
+            start = int(query.get("start", ["0"])[0])
+            base = int(hashlib.sha1(puuid.encode()).hexdigest()[:8], 16)
+            platform = ROUTING_TO_PLATFORM.get(host, "NA1")
+            # Every synthetic player has history_size matches on the patch
+            return [f"{platform}_{base + i}" for i in range(start, min(start + count, self.history_size))]
+        if path.startswith("/lol/match/v5/matches/") and path.endswith("/timeline"):
+            return self.timeline_bytes
+        if path.startswith("/lol/match/v5/matches/"):
+            return synthetic_match(self.timeline, parts[4], self.game_version)
+        return None
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    state = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def send_body(self, status, body, headers):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.state
+        url = urlsplit(self.path)
+        host, _, rest = url.path.lstrip('/').partition('/')
+        path = '/' + rest
+        method = method_for(path)
+
+        if state.latency:
+            delay = state.latency * (1 + state.jitter * (2 * state.roll() - 1))
+            time.sleep(max(delay, 0))
+
+        app_counts, app_wait = state.counter(host, state.app_limits).hit()
+        method_counts, method_wait = state.counter((host, method), state.method_limits).hit()
+        headers = {
+            "X-App-Rate-Limit": state.app_limit_header,
+            "X-App-Rate-Limit-Count": app_counts,
+            "X-Method-Rate-Limit": state.method_limit_header,
+            "X-Method-Rate-Limit-Count": method_counts,
+        }
+
+        if app_wait or method_wait:
+            headers["Retry-After"] = str(max(1, int(max(app_wait, method_wait) + 0.999)))
+            headers["X-Rate-Limit-Type"] = "application" if app_wait >= method_wait else "method"
+            return self.send_body(429, {"status": {"message": "Rate limit exceeded", "status_code": 429}}, headers)
+        if state.roll() < state.p429:
+            headers["Retry-After"] = str(state.retry_after)
+            headers["X-Rate-Limit-Type"] = "service"
+            return self.send_body(429, {"status": {"message": "Rate limit exceeded", "status_code": 429}}, headers)
+        if state.roll() < state.p5xx:
+            return self.send_body(503, {"status": {"message": "Service unavailable", "status_code": 503}}, headers)
+
+        body = None
+        if state.fixtures:
+            fixture = fixture_path(state.fixtures, host, path)
+            if os.path.exists(fixture):
+                with open(fixture, "rb") as f:
+                    body = f.read()
+        if body is None:
+            body = state.synthetic(host, path, parse_qs(url.query))
+        if body is None:
+            return self.send_body(404, {"status": {"message": "Data not found", "status_code": 404}}, headers)
+        self.send_body(200, body, headers)
+
+def serve(args):
+    ReplayHandler.state = ReplayState(args)
+    server = ThreadingHTTPServer((args.bind, args.port), ReplayHandler)
+    server.daemon_threads = True
+    logger.info(f"Replaying Riot API on http://{args.bind}:{server.server_address[1]}/{{host}}")
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local record/replay stand-in for the Riot API.")
+    parser.add_argument('--bind', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixtures', default=None, help='Directory of responses recorded with RIOT_API_RECORD_DIR')
+    parser.add_argument('--timeline', default='tests/timeline.json', help='Timeline served for matches without a fixture')
+    parser.add_argument('--latency', type=float, default=0, help='Added latency per request, in ms')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Latency jitter as a fraction of --latency')
+    parser.add_argument('--p429', type=float, default=0, help='Probability of a service 429')
+    parser.add_argument('--p5xx', type=float, default=0, help='Probability of a 503')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds for injected 429s')
+    parser.add_argument('--app-limits', default='20:1,100:120', help='Enforced and reported X-App-Rate-Limit')
+    parser.add_argument('--method-limits', default='2000:10', help='Enforced and reported X-Method-Rate-Limit')
+    parser.add_argument('--league-size', type=int, default=50, help='Entries in synthetic league responses')
+    parser.add_argument('--league-pages', type=int, default=1, help='Pages in each synthetic tier/division ladder')
+    parser.add_argument('--history-size', type=int, default=250, help='Matches in each synthetic player history')
+    parser.add_argument('--game-version', default='15.7.671.1', help='gameVersion of synthetic matches')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for injected faults and latency')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = serve(args)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
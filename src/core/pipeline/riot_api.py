@@ -1,80 +1,390 @@
 # riot_api.py
 
+import os
 import time
+import random
+import threading
 import requests
 import logging
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from fixtures import fixture_path
+from timeline_stream import TimelineEventDecoder
+from fast_decode import loads
+from telemetry import TELEMETRY
+import config
 from config import API_KEY, REGIONS, RANKED_SOLO_QUEUE_ID
 logger = logging.getLogger()
 
-BASE_URL_TEMPLATE = "https://{host}.api.riotgames.com"
+BASE_URL_TEMPLATE = config.BASE_URL_TEMPLATE
+RECORD_DIR = config.RECORD_DIR
+STREAM_CHUNK_SIZE = 64 * 1024
+# Largest count accepted by match-v5 by-puuid/ids
+MATCH_IDS_PAGE_SIZE = 100
+# Responses that mean the key itself is unusable (revoked, expired, blacklisted)
+REJECTED_KEY_STATUS = (401, 403)
+# Responses that will not change on a later request (unknown or malformed match ID)
+PERMANENT_FAILURE_STATUS = (400, 404)
 
-def call_api(url, params=None):
+# Riot method names, used to keep a separate method rate limit budget per endpoint
+MATCH_BY_ID = "match-v5.getMatch"
+MATCH_TIMELINE = "match-v5.getTimeline"
+MATCH_IDS_BY_PUUID = "match-v5.getMatchIdsByPUUID"
+LEAGUE_ENTRIES = "league-v4.getLeagueEntries"
+LEAGUE_ENTRIES_BY_PUUID = "league-v4.getLeagueEntriesByPUUID"
+APEX_LEAGUE = "league-v4.get{tier}League"
+
+# Connection pooling: one keep-alive session per API host (routing or platform value),
+# so consecutive calls to e.g. americas.api.riotgames.com reuse the same TCP+TLS connection.
+SESSION_POOL_DEFAULTS = {
+    "pool_maxsize": 10,   # max idle connections kept open to a host
+    "keep_alive": True,
+}
+_session_pool_config = {}  # routing/platform value -> overrides of SESSION_POOL_DEFAULTS
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def configure_session_pool(host=None, pool_maxsize=None, keep_alive=None):
+    """
+    Tune the connection pool for one routing/platform value (e.g. "americas", "na1"),
+    or the defaults for every host when host is None. Already opened sessions are reset.
+    """
+    target = SESSION_POOL_DEFAULTS if host is None else _session_pool_config.setdefault(host, {})
+    if pool_maxsize is not None:
+        target["pool_maxsize"] = pool_maxsize
+    if keep_alive is not None:
+        target["keep_alive"] = keep_alive
+    close_sessions()
+
+def ensure_pool_size(min_size):
+    """
+    Keep at least min_size connections per host (e.g. the concurrent calls a client makes to
+    one host), so urllib3 does not discard the extra connections and handshake again.
+    """
+    changed = False
+    for settings in (SESSION_POOL_DEFAULTS, *_session_pool_config.values()):
+        if settings.get("pool_maxsize", min_size) < min_size:
+            settings["pool_maxsize"] = min_size
+            changed = True
+    if changed:
+        close_sessions()
+
+def get_session(host):
+    """
+    Return the shared requests.Session for a routing/platform value, creating it on first use.
+    """
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            settings = {**SESSION_POOL_DEFAULTS, **_session_pool_config.get(host, {})}
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings["pool_maxsize"])
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if not settings["keep_alive"]:
+                session.headers["Connection"] = "close"
+            _sessions[host] = session
+        return session
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+def host_from_url(url):
+    # "https://americas.api.riotgames.com/..." -> "americas"
+    parts = urlsplit(url)
+    if parts.hostname.endswith(".api.riotgames.com"):
+        return parts.hostname.split('.')[0]
+    # Base URL override ("http://127.0.0.1:8765/{host}"): the host is the first path segment
+    return parts.path.strip('/').split('/')[0]
+
+def configure_base_url(base_url_template=None, record_dir=None):
+    """
+    Send API calls to base_url_template (must contain "{host}") instead of Riot, and/or
+    save every successful response under record_dir for replay_server.py.
+    """
+    global BASE_URL_TEMPLATE, RECORD_DIR
+    if base_url_template is not None:
+        BASE_URL_TEMPLATE = base_url_template
+    if record_dir is not None:
+        RECORD_DIR = record_dir
+
+def record_response(url, response):
+    parts = urlsplit(url)
+    host = host_from_url(url)
+    path = parts.path
+    if not parts.hostname.endswith(".api.riotgames.com"):
+        path = path.strip('/')[len(host):]
+    target = fixture_path(RECORD_DIR, host, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as f:
+        f.write(response.content)
+
+class RetryPolicy:
+    """
+    Bounded retries for transient failures (timeouts, connection errors, 5xx, 429).
+    Backoff is exponential with full jitter, capped at max_delay.
+    """
+    RETRYABLE_STATUS = {500, 502, 503, 504}
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=30.0, timeout=(3.05, 15)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout  # (connect, read) seconds, passed to requests
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+class CircuitBreaker:
+    """
+    Pauses every call to one routing/platform value after failure_threshold consecutive
+    failures, for reset_timeout seconds, instead of hammering a degraded Riot host.
+    """
+    def __init__(self, host, failure_threshold=5, reset_timeout=30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            pause = self.open_until - time.time()
+        if pause > 0:
+            time.sleep(pause)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold and self.open_until <= time.time():
+                self.open_until = time.time() + self.reset_timeout
+                # Half-open: one more failure after the pause trips it again
+                self.failures = self.failure_threshold - 1
+                logger.warning(f"Circuit breaker open for {self.host}: pausing calls for {self.reset_timeout}s.")
+
+RETRY_POLICY = RetryPolicy()
+CIRCUIT_BREAKER_DEFAULTS = {"failure_threshold": 5, "reset_timeout": 30.0}
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def configure_retry_policy(max_attempts=None, base_delay=None, max_delay=None, timeout=None,
+                           failure_threshold=None, reset_timeout=None):
+    for name, value in (("max_attempts", max_attempts), ("base_delay", base_delay),
+                        ("max_delay", max_delay), ("timeout", timeout)):
+        if value is not None:
+            setattr(RETRY_POLICY, name, value)
+    if failure_threshold is not None:
+        CIRCUIT_BREAKER_DEFAULTS["failure_threshold"] = failure_threshold
+    if reset_timeout is not None:
+        CIRCUIT_BREAKER_DEFAULTS["reset_timeout"] = reset_timeout
+    with _breakers_lock:
+        _breakers.clear()
+
+def get_circuit_breaker(host):
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host, **CIRCUIT_BREAKER_DEFAULTS)
+        return _breakers[host]
+
+def call_api(url, params=None, method=None, rate_limits=None, decoder=None, on_error=None, raw=False):
+    """
+    GET a Riot API url. The app and method limiters for (host, method) are taken from
+    rate_limits (a RateLimitRegistry, a KeyPool choosing the least-loaded key per attempt, or a
+    scheduler RegionShare taking turns with other regions), acquired before the request and
+    updated from the rate limit headers of the response. Latency, bytes, statuses, retries
+    and limiter waits are recorded in TELEMETRY.
+    decoder, if given, is a factory for a streaming decoder (feed(chunk) / close()) that
+    consumes the body as it arrives instead of building it with response.json().
+    on_error, if given, is called with the status code of a response that ends the call
+    without a payload (not for the retried 429s and 5xx).
+    raw returns the response body as received (bytes) instead of decoding it; a decoder wins.
+    """
     if params is None:
         params = {}
-    headers = {
-        "X-Riot-Token": API_KEY,
-        "User-Agent": "Build_Data_Visual/1.0.0 (+https://github.com/build_data_visual)"
-    }
     # logger.info(f"Calling API URL: {url} with params: {params}")
-    try:
-        response = requests.get(url, params=params, headers=headers)
-    except Exception as e:
-        logger.error(f"Exception during API call: {e}")
-        return None
-    if response.status_code == 429:
-        retry_after = int(response.headers.get("Retry-After", "1"))
-        logger.warning(f"Rate limited. Retrying after {retry_after} seconds.")
-        time.sleep(retry_after)
-        return call_api(url, params)
-    elif response.status_code != 200:
-        logger.error(f"API call failed: {response.status_code} - {response.text}")
-        # logger.error(f"Response headers: {response.headers}")
-        return None
-    return response.json()
-
-def fetch_league_players(region, tier="CHALLENGER", division=None):
+    host = host_from_url(url)
+    breaker = get_circuit_breaker(host)
+    # Recording needs the raw body, so it turns streaming off
+    stream = decoder is not None and not RECORD_DIR
+    for attempt in range(1, RETRY_POLICY.max_attempts + 1):
+        registry = rate_limits.select(host, method) if rate_limits is not None else None
+        if rate_limits is not None and registry is None:
+            logger.error(f"No usable API key left for {url}.")
+            return None
+        limiters = registry.limiters_for(host, method) if registry is not None else ()
+        headers = {
+            "X-Riot-Token": (registry.api_key if registry is not None else None) or API_KEY,
+            "User-Agent": "Build_Data_Visual/1.0.0 (+https://github.com/build_data_visual)"
+        }
+        breaker.wait()
+        if rate_limits is not None:
+            waited_from = time.monotonic()
+            rate_limits.acquire(host, limiters)
+            TELEMETRY.observe_acquire_wait(host, method, time.monotonic() - waited_from)
+        requested_at = time.monotonic()
+        try:
+            response = get_session(host).get(url, params=params, headers=headers, timeout=RETRY_POLICY.timeout, stream=stream)
+            if stream and response.status_code == 200:
+                received = 0
+                body = decoder()
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    received += len(chunk)
+                    body.feed(chunk)
+                payload = body.close()
+            else:
+                # Also drains small streamed error bodies so the connection goes back to the pool
+                received = len(response.content)
+        except (requests.RequestException, ValueError) as e:
+            TELEMETRY.count_retry(host, method, "exception")
+            breaker.record_failure()
+            delay = RETRY_POLICY.backoff(attempt)
+            logger.warning(f"Exception during API call ({attempt}/{RETRY_POLICY.max_attempts}): {e}. Retrying in {delay:.1f}s.")
+            time.sleep(delay)
+            continue
+        TELEMETRY.observe_response(host, method, response.status_code, time.monotonic() - requested_at, received)
+        for limiter in limiters:
+            limiter.update_from_headers(response.headers)
+        if response.status_code == 429:
+            retry_after = int(response.headers.get("Retry-After", "1"))
+            limit_type = response.headers.get("X-Rate-Limit-Type", "service")
+            TELEMETRY.count_retry(host, method, f"429-{limit_type}")
+            logger.warning(f"Rate limited ({limit_type}). Retrying after {retry_after} seconds.")
+            for limiter in limiters:
+                if limiter.scope == limit_type:
+                    limiter.penalize(retry_after)
+            time.sleep(retry_after)
+            continue
+        if response.status_code in RETRY_POLICY.RETRYABLE_STATUS:
+            TELEMETRY.count_retry(host, method, str(response.status_code))
+            breaker.record_failure()
+            delay = RETRY_POLICY.backoff(attempt)
+            logger.warning(f"API call failed ({attempt}/{RETRY_POLICY.max_attempts}): {response.status_code}. Retrying in {delay:.1f}s.")
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        if response.status_code in REJECTED_KEY_STATUS and hasattr(rate_limits, "retire"):
+            # Retry on another key, if any is left
+            if rate_limits.retire(registry, response.status_code):
+                continue
+        if response.status_code != 200:
+            logger.error(f"API call failed: {response.status_code} - {response.text}")
+            if on_error is not None:
+                on_error(response.status_code)
+            # logger.error(f"Response headers: {response.headers}")
+            return None
+        if stream:
+            return payload
+        if RECORD_DIR:
+            record_response(url, response)
+        if decoder is not None:
+            body = decoder()
+            body.feed(response.content)
+            return body.close()
+        if raw:
+            return response.content
+        return loads(response.content)
+    logger.error(f"Giving up on {url} after {RETRY_POLICY.max_attempts} attempts.")
+    return None
+
+def fetch_league_players(region, tier="CHALLENGER", division=None, rate_limits=None):
     platform = REGIONS[region]['platform']
     base_url = BASE_URL_TEMPLATE.format(host=platform)
     if tier.upper() in ["CHALLENGER", "MASTER", "GRANDMASTER"]:
         url = f"{base_url}/lol/league/v4/{tier.lower()}leagues/by-queue/RANKED_SOLO_5x5"
-        return call_api(url)
+        return call_api(url, method=APEX_LEAGUE.format(tier=tier.capitalize()), rate_limits=rate_limits)
     else:
-        # For tiers with multiple divisions (e.g., Platinum, Diamond)
-        if division:
-            url = f"{base_url}/lol/league/v4/entries/RANKED_SOLO_5x5/{tier.upper()}/{division}"
-            return call_api(url)
-        else:
-            divisions = ["I", "II", "III", "IV"]
-            combined_results = []
-            for div in divisions:
-                url = f"{base_url}/lol/league/v4/entries/RANKED_SOLO_5x5/{tier.upper()}/{div}"
-                result = call_api(url)
-                if result:
-                    combined_results.extend(result)
-            return {"entries": combined_results}
-
-def fetch_match_ids_by_puuid(region, puuid, start_time, count=20):
+        # For tiers with multiple divisions (e.g., Platinum, Diamond), every page of each division
+        divisions = [division] if division else ["I", "II", "III", "IV"]
+        combined_results = []
+        for div in divisions:
+            page = 1
+            while True:
+                result = fetch_league_entries_page(region, tier, div, page, rate_limits=rate_limits)
+                if not result:
+                    break
+                combined_results.extend(result)
+                page += 1
+        return {"entries": combined_results} if not division else combined_results
+
+def fetch_league_entries_page(region, tier, division, page=1, rate_limits=None):
+    platform = REGIONS[region]['platform']
+    base_url = BASE_URL_TEMPLATE.format(host=platform)
+    url = f"{base_url}/lol/league/v4/entries/RANKED_SOLO_5x5/{tier.upper()}/{division}"
+    return call_api(url, params={"page": page}, method=LEAGUE_ENTRIES, rate_limits=rate_limits)
+
+def fetch_league_entries_by_puuid(region, puuid, rate_limits=None):
+    platform = REGIONS[region]['platform']
+    base_url = BASE_URL_TEMPLATE.format(host=platform)
+    url = f"{base_url}/lol/league/v4/entries/by-puuid/{puuid}"
+    return call_api(url, method=LEAGUE_ENTRIES_BY_PUUID, rate_limits=rate_limits)
+
+def fetch_match_ids_by_puuid(region, puuid, start_time, count=20, rate_limits=None, start=0):
     routing = REGIONS[region]['routing']
     base_url = BASE_URL_TEMPLATE.format(host=routing)
     url = f"{base_url}/lol/match/v5/matches/by-puuid/{puuid}/ids"
     params = {
         "queue": RANKED_SOLO_QUEUE_ID,
-        "startTime": start_time,
         "count": count
     }
-    return call_api(url, params=params)
+    if start:
+        params["start"] = start
+    if start_time is not None:
+        params["startTime"] = start_time
+    return call_api(url, params=params, method=MATCH_IDS_BY_PUUID, rate_limits=rate_limits)
+
+def iter_match_ids_by_puuid(region, puuid, start_time=None, limit=None, rate_limits=None):
+    """
+    Yield a player's match IDs page by page, newest first, with pages of up to
+    MATCH_IDS_PAGE_SIZE (the API maximum). startTime keeps the listing inside the patch,
+    so a page shorter than requested is the last one. Stops after limit IDs if given.
+    A failed page is yielded as None and ends the iteration.
+    """
+    listed = 0
+    while limit is None or listed < limit:
+        count = MATCH_IDS_PAGE_SIZE if limit is None else min(MATCH_IDS_PAGE_SIZE, limit - listed)
+        page = fetch_match_ids_by_puuid(region, puuid, start_time, count=count, rate_limits=rate_limits, start=listed)
+        yield page
+        if not page or len(page) < count:
+            return
+        listed += len(page)
+
+def list_match_ids_by_puuid(region, puuid, start_time=None, limit=None, rate_limits=None):
+    """
+    All of a player's match IDs since start_time (at most limit), as (match_ids, complete).
+    complete is False when a page failed; match_ids then holds the pages listed before it.
+    """
+    match_ids = []
+    for page in iter_match_ids_by_puuid(region, puuid, start_time, limit, rate_limits):
+        if page is None:
+            return match_ids, False
+        match_ids.extend(page)
+    return match_ids, True
 
-def fetch_match_details(region, match_id):
+def fetch_match_details(region, match_id, rate_limits=None, on_error=None, raw=False):
     routing = get_routing_for_match(match_id, region)
     base_url = BASE_URL_TEMPLATE.format(host=routing)
     url = f"{base_url}/lol/match/v5/matches/{match_id}"
-    return call_api(url)
+    return call_api(url, method=MATCH_BY_ID, rate_limits=rate_limits, on_error=on_error, raw=raw)
 
-def fetch_match_timeline(region, match_id):
+def fetch_match_timeline(region, match_id, rate_limits=None, event_types=None, on_error=None, raw=False):
+    """
+    Fetch a match timeline. With event_types (e.g. ITEM_EVENT_TYPES) the body is stream-decoded
+    and only those events are kept; the full timeline object is never built. Otherwise raw
+    returns the undecoded body.
+    """
     routing = get_routing_for_match(match_id, region)
     base_url = BASE_URL_TEMPLATE.format(host=routing)
     url = f"{base_url}/lol/match/v5/matches/{match_id}/timeline"
-    return call_api(url)
+    decoder = (lambda: TimelineEventDecoder(event_types)) if event_types else None
+    return call_api(url, method=MATCH_TIMELINE, rate_limits=rate_limits, decoder=decoder, on_error=on_error, raw=raw)
 
 def get_routing_for_match(match_id, region):
     # Infer routing based on the match_id prefix
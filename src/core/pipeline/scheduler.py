@@ -0,0 +1,158 @@
+# scheduler.py
+
+import time
+import logging
+import threading
+from collections import Counter
+from rate_limiter import acquire_all
+from config import REGIONS
+
+logger = logging.getLogger()
+
+DEFAULT_ETA_INTERVAL = 60  # seconds between ETA log lines
+
+class FairScheduler:
+    """
+    Weighted fair sharing of each routing's request budget between the regions behind it
+    (americas: NA, BR, LAN, LAS; europe: EUW, EUNE; asia: KR, JP).
+
+    Callers take their turn here before taking rate limiter slots. A turn goes to the waiting
+    region with the smallest virtual finish time (requests granted / weight), so while regions
+    have work they get the budget in proportion to their weight, and once a region drains its
+    share goes to the regions still waiting.
+    """
+    def __init__(self, rate_limits, weights=None):
+        self.rate_limits = rate_limits
+        self.weights = weights or {}
+        self.backlog = Counter()  # region -> requests still expected on its routing
+        self.granted = Counter()  # region -> requests granted
+        self._condition = threading.Condition()
+        # Turns are taken per lane: the host plus the limiters (key and method budgets) being
+        # acquired, so callers only queue behind callers that need the same budgets
+        self._waiting = {}  # lane -> Counter of waiting callers per region
+        self._finish = {}   # (lane, region) -> virtual finish time of the region's last turn
+        self._vtime = {}    # lane -> virtual time of the last turn
+        self._busy = set()  # lanes with a caller taking limiter slots
+        self._reporter = None
+
+    def weight(self, region):
+        return self.weights.get(region, 1.0)
+
+    def share(self, region):
+        return RegionShare(self, region)
+
+    def _start_tag(self, lane, region):
+        return max(self._vtime.get(lane, 0.0), self._finish.get((lane, region), 0.0))
+
+    def _next_region(self, lane):
+        waiting = self._waiting.get(lane)
+        if not waiting:
+            return None
+        # Smallest finish tag; on a tie the region that has waited since the earlier virtual time
+        return min(waiting, key=lambda region: (self._start_tag(lane, region) + 1 / self.weight(region), self._start_tag(lane, region)))
+
+    def acquire(self, host, region, limiters):
+        lane = (host, *(id(limiter) for limiter in limiters))
+        with self._condition:
+            waiting = self._waiting.setdefault(lane, Counter())
+            waiting[region] += 1
+            while lane in self._busy or self._next_region(lane) != region:
+                self._condition.wait()
+            waiting[region] -= 1
+            if not waiting[region]:
+                del waiting[region]
+            start = self._start_tag(lane, region)
+            self._finish[(lane, region)] = start + 1 / self.weight(region)
+            self._vtime[lane] = start
+            self._busy.add(lane)
+        try:
+            acquire_all(limiters)
+        finally:
+            with self._condition:
+                self._busy.discard(lane)
+                self.granted[region] += 1
+                if REGIONS[region]['routing'] == host and self.backlog[region] > 0:
+                    self.backlog[region] -= 1
+                self._condition.notify_all()
+
+    def set_backlog(self, region, requests):
+        with self._condition:
+            self.backlog[region] = requests
+
+    def rate(self, host):
+        """
+        Sustained requests per second the keys allow on host (tightest app window).
+        """
+        registries = self.rate_limits.active() if hasattr(self.rate_limits, "active") else [self.rate_limits]
+        total = 0.0
+        for registry in registries:
+            limits = registry.app(host).limits()
+            if limits:
+                total += min(calls / period for calls, period in limits)
+        return total
+
+    def estimates(self):
+        """
+        {region: seconds} until each region's backlog is done at the current rates, with every
+        routing shared by weight and a drained region's share going to the others.
+        """
+        with self._condition:
+            backlog = {region: count for region, count in self.backlog.items() if count > 0}
+        etas = {}
+        for host in {REGIONS[region]['routing'] for region in backlog}:
+            rate = self.rate(host)
+            remaining = {region: float(count) for region, count in backlog.items() if REGIONS[region]['routing'] == host}
+            if rate <= 0:
+                etas.update({region: float('inf') for region in remaining})
+                continue
+            elapsed = 0.0
+            while remaining:
+                total_weight = sum(self.weight(region) for region in remaining)
+                speeds = {region: rate * self.weight(region) / total_weight for region in remaining}
+                step = min(remaining[region] / speeds[region] for region in remaining)
+                elapsed += step
+                for region in list(remaining):
+                    remaining[region] -= step * speeds[region]
+                    if remaining[region] <= 1e-9:
+                        etas[region] = elapsed
+                        del remaining[region]
+        return etas
+
+    def log_estimates(self):
+        etas = self.estimates()
+        if etas:
+            parts = ", ".join(f"{region} {self.backlog[region]} calls ~{eta / 60:.0f} min" for region, eta in sorted(etas.items(), key=lambda item: item[1]))
+            logger.info(f"Crawl ETA: {parts}")
+
+    def start_reporting(self, interval=DEFAULT_ETA_INTERVAL):
+        def report():
+            while True:
+                time.sleep(interval)
+                self.log_estimates()
+        self._reporter = threading.Thread(target=report, daemon=True, name="scheduler-eta")
+        self._reporter.start()
+
+class RegionShare:
+    """
+    One region's handle on the shared rate limits: same keys and limiters, with every slot
+    taken through the scheduler. Passed wherever a RateLimitRegistry is accepted.
+    """
+    def __init__(self, scheduler, region):
+        self.scheduler = scheduler
+        self.region = region
+
+    def select(self, host, method):
+        return self.scheduler.rate_limits.select(host, method)
+
+    def limiters_for(self, host, method):
+        return self.scheduler.rate_limits.limiters_for(host, method)
+
+    def acquire(self, host, limiters):
+        self.scheduler.acquire(host, self.region, limiters)
+
+    def retire(self, registry, status):
+        retire = getattr(self.scheduler.rate_limits, "retire", None)
+        return retire(registry, status) if retire is not None else False
+
+    def set_backlog(self, requests):
+        self.scheduler.set_backlog(self.region, requests)
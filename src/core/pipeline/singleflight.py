@@ -0,0 +1,58 @@
+# singleflight.py
+
+import asyncio
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs fn, and callers that
+    arrive while it runs wait for it and get the same result (or exception). Once the call
+    returns the key is forgotten, so a later call runs fn again.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines running on one event loop.
+    """
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        future = self._calls.get(key)
+        if future is not None:
+            # shield: a cancelled waiter must not cancel the shared call
+            return await asyncio.shield(future)
+        future = self._calls[key] = asyncio.ensure_future(fn(*args, **kwargs))
+        future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
@@ -0,0 +1,131 @@
+# telemetry.py
+
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger()
+
+# Upper bounds in seconds
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+WAIT_BUCKETS = (0.001, 0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 120)
+DEFAULT_METRICS_INTERVAL = 15
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus layout (counts per upper bound, sum, count).
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += count
+            yield bound, total
+
+    def to_dict(self):
+        return {"buckets": {str(bound): count for bound, count in self.cumulative()}, "sum": self.sum, "count": self.count}
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+class Telemetry:
+    """
+    In-process metrics of the API client: per (host, method) request latency and limiter wait
+    histograms, response counts per status, bytes downloaded and retries per reason. host is
+    the routing or platform value, so per-routing figures are sums over methods.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))   # (host, method)
+        self.acquire_wait = defaultdict(lambda: Histogram(WAIT_BUCKETS))  # (host, method)
+        self.responses = defaultdict(int)  # (host, method, status)
+        self.bytes = defaultdict(int)      # (host, method)
+        self.retries = defaultdict(int)    # (host, method, reason)
+        self.started = time.time()
+        self._exporter = None
+
+    def observe_response(self, host, method, status, seconds, received):
+        key = (host, method or "other")
+        with self._lock:
+            self.latency[key].observe(seconds)
+            self.responses[(*key, status)] += 1
+            self.bytes[key] += received
+
+    def observe_acquire_wait(self, host, method, seconds):
+        with self._lock:
+            self.acquire_wait[(host, method or "other")].observe(seconds)
+
+    def count_retry(self, host, method, reason):
+        with self._lock:
+            self.retries[(host, method or "other", reason)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uptime_seconds": time.time() - self.started,
+                "latency_seconds": [{"host": h, "method": m, **hist.to_dict()} for (h, m), hist in self.latency.items()],
+                "acquire_wait_seconds": [{"host": h, "method": m, **hist.to_dict()} for (h, m), hist in self.acquire_wait.items()],
+                "responses": [{"host": h, "method": m, "status": s, "count": n} for (h, m, s), n in self.responses.items()],
+                "bytes": [{"host": h, "method": m, "bytes": n} for (h, m), n in self.bytes.items()],
+                "retries": [{"host": h, "method": m, "reason": r, "count": n} for (h, m, r), n in self.retries.items()],
+            }
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            for name, histograms, help_text in (
+                ("riot_api_request_seconds", self.latency, "API request latency, including the body download"),
+                ("riot_api_acquire_wait_seconds", self.acquire_wait, "Time blocked waiting for rate limiter slots"),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (host, method), hist in histograms.items():
+                    for bound, count in hist.cumulative():
+                        lines.append(f'{name}_bucket{{{_labels(host=host, method=method, le=bound)}}} {count}')
+                    lines.append(f'{name}_sum{{{_labels(host=host, method=method)}}} {hist.sum}')
+                    lines.append(f'{name}_count{{{_labels(host=host, method=method)}}} {hist.count}')
+            lines += ["# HELP riot_api_responses_total API responses by status code", "# TYPE riot_api_responses_total counter"]
+            lines += [f'riot_api_responses_total{{{_labels(host=h, method=m, status=s)}}} {n}' for (h, m, s), n in self.responses.items()]
+            lines += ["# HELP riot_api_response_bytes_total Response body bytes downloaded", "# TYPE riot_api_response_bytes_total counter"]
+            lines += [f'riot_api_response_bytes_total{{{_labels(host=h, method=m)}}} {n}' for (h, m), n in self.bytes.items()]
+            lines += ["# HELP riot_api_retries_total Retried API calls by reason", "# TYPE riot_api_retries_total counter"]
+            lines += [f'riot_api_retries_total{{{_labels(host=h, method=m, reason=r)}}} {n}' for (h, m, r), n in self.retries.items()]
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory):
+        """
+        Write riot_api.prom (node_exporter textfile format) and riot_api.json under directory.
+        Files are replaced atomically so a scraper never reads a partial file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name, content in (("riot_api.prom", self.to_prometheus()), ("riot_api.json", json.dumps(self.snapshot(), indent=2))):
+            path = os.path.join(directory, name)
+            with open(f"{path}.tmp", "w") as f:
+                f.write(content)
+            os.replace(f"{path}.tmp", path)
+
+    def start_exporting(self, directory, interval=DEFAULT_METRICS_INTERVAL):
+        def export_loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.export(directory)
+                except OSError as e:
+                    logger.warning(f"Could not export metrics to {directory}: {e}")
+        self._exporter = threading.Thread(target=export_loop, daemon=True, name="metrics-export")
+        self._exporter.start()
+
+TELEMETRY = Telemetry()
@@ -0,0 +1,83 @@
+# timeline_stream.py
+
+import json
+import codecs
+from data_parser import ITEM_EVENT_TYPES
+
+_EVENTS_KEY = '"events"'
+_WHITESPACE = " \t\n\r"
+
+class TimelineEventDecoder:
+    """
+    Incremental decoder for match-v5 timeline bodies. Fed the response chunk by chunk, it
+    jumps from one "events" array to the next with str.find, decodes the events one at a time
+    and keeps those whose type is wanted. participantFrames, positions and unwanted events are
+    never kept, so memory stays at one chunk plus the selected events.
+
+    close() returns a timeline shaped like the API's ({"info": {"frames": [{"events": [...]}]}})
+    holding only the selected events, which parse_item_events reads unchanged.
+    """
+    def __init__(self, event_types=ITEM_EVENT_TYPES):
+        self.event_types = set(event_types)
+        self.events = []
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._in_events = False
+
+    def feed(self, chunk):
+        if isinstance(chunk, bytes):
+            chunk = self._text.decode(chunk)
+        self._buffer += chunk
+        self._scan(final=False)
+
+    def close(self):
+        self._buffer += self._text.decode(b"", final=True)
+        self._scan(final=True)
+        self._buffer = ""
+        return {"info": {"frames": [{"events": self.events}]}}
+
+    def _scan(self, final):
+        buffer = self._buffer
+        pos = 0
+        end = len(buffer)
+        while True:
+            if not self._in_events:
+                found = buffer.find(_EVENTS_KEY, pos)
+                if found < 0:
+                    # Keep enough of the tail to match a key split across chunks
+                    pos = max(pos, end - len(_EVENTS_KEY))
+                    break
+                start = buffer.find('[', found + len(_EVENTS_KEY))
+                if start < 0:
+                    pos = found
+                    break
+                self._in_events = True
+                pos = start + 1
+                continue
+
+            while pos < end and (buffer[pos] in _WHITESPACE or buffer[pos] == ','):
+                pos += 1
+            if pos == end:
+                break
+            if buffer[pos] == ']':
+                self._in_events = False
+                pos += 1
+                continue
+            try:
+                event, next_pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                # The event is cut by the chunk boundary: wait for more data
+                break
+            if event.get("type") in self.event_types:
+                self.events.append(event)
+            pos = next_pos
+        self._buffer = buffer[pos:]
+
+def decode_timeline_events(chunks, event_types=ITEM_EVENT_TYPES):
+    decoder = TimelineEventDecoder(event_types)
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.close()
@@ -0,0 +1,224 @@
+# writer.py
+
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from db import (
+    init_db,
+    get_watermarks,
+    get_stored_matches,
+    get_failed_matches,
+    get_skipped_matches,
+    INSERT_OR_IGNORE_MATCH_RECORD_SQL,
+    SET_WATERMARK_SQL,
+    ADD_FAILED_MATCH_SQL,
+    ADD_SKIPPED_MATCH_SQL
+)
+
+logger = logging.getLogger()
+
+DEFAULT_DB_PATH = "data/matches.db"
+DEFAULT_BATCH_SIZE = 500        # rows per transaction
+DEFAULT_FLUSH_INTERVAL = 1.0    # seconds a row may wait for its batch to fill
+DEFAULT_MAX_QUEUE = 10000       # queued writes before producers block
+REPORT_INTERVAL = 60            # seconds between throughput log lines
+DB_TIMEOUT = 30                 # seconds to wait on another process's write lock
+FLUSH_ATTEMPTS = 5              # tries per batch before its writes are given up
+FLUSH_BACKOFF = 0.5             # seconds before the first retry, doubled after each
+
+_STOP = object()
+
+class MatchWriter:
+    """
+    The one thread writing the matches database (and the payload archive). Crawler threads
+    queue parsed lane records, watermarks, failed or skipped matches and archived payloads; the writer
+    commits them in multi-row transactions once batch_size rows are waiting or flush_interval
+    has passed, so nothing fsyncs per row and no two threads contend for the database lock.
+    A full queue blocks producers.
+
+    Crawler threads read through it too: which matches are stored, failed or skipped (kept in memory,
+    including writes not flushed yet) and player watermarks, both loaded once at start.
+    """
+    def __init__(self, db_path=DEFAULT_DB_PATH, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL, max_queue=DEFAULT_MAX_QUEUE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.rows_written = 0
+        conn = init_db(db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        self.known_matches = get_stored_matches(conn) | get_failed_matches(conn) | get_skipped_matches(conn)
+        self.watermarks = get_watermarks(conn)
+        conn.close()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="match-writer")
+        self._thread.start()
+
+    def is_known(self, match_id):
+        with self._lock:
+            return match_id in self.known_matches
+
+    def mark_known(self, match_id):
+        """
+        Claim a match handed to a later stage, so it is not fetched again before its rows arrive.
+        """
+        with self._lock:
+            self.known_matches.add(match_id)
+
+    def forget(self, match_id):
+        """
+        Drop the claim on a match that never reached the writer, so it can be fetched again.
+        """
+        with self._lock:
+            self.known_matches.discard(match_id)
+
+    def put_rows(self, match_id, rows):
+        self.mark_known(match_id)
+        if rows:
+            self.queue.put(("rows", rows))
+
+    def put_archive(self, archive, entries):
+        """
+        Queue encoded payloads (archive.encode_payload) for archive; appended with each batch.
+        """
+        if entries:
+            self.queue.put(("archive", (archive, entries)))
+
+    def add_failed_match(self, match_id, status):
+        with self._lock:
+            self.known_matches.add(match_id)
+        self.queue.put(("failed", (match_id, status, int(time.time()))))
+
+    def add_skipped_match(self, match_id, reason):
+        with self._lock:
+            self.known_matches.add(match_id)
+        self.queue.put(("skipped", (match_id, reason, int(time.time()))))
+
+    def set_watermark(self, puuid, last_start_time):
+        with self._lock:
+            self.watermarks[puuid] = max(last_start_time, self.watermarks.get(puuid, last_start_time))
+        self.queue.put(("watermark", (puuid, last_start_time, int(time.time()))))
+
+    def get_watermarks(self, puuids):
+        with self._lock:
+            return {puuid: self.watermarks[puuid] for puuid in puuids if puuid in self.watermarks}
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, timeout=DB_TIMEOUT)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: a commit is an append to the log, synced at checkpoints
+        conn.execute("PRAGMA synchronous=NORMAL")
+        rows, watermarks, failed, skipped, archived = [], [], [], [], {}
+        batch_started = None  # when the oldest unflushed write arrived
+        last_report = time.monotonic()
+        reported_rows = 0
+        stopping = False
+        while not stopping:
+            timeout = self.flush_interval
+            if batch_started is not None:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - batch_started))
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                kind, payload = item
+                if kind == "rows":
+                    rows.extend(payload)
+                elif kind == "watermark":
+                    watermarks.append(payload)
+                elif kind == "skipped":
+                    skipped.append(payload)
+                elif kind == "archive":
+                    archive, entries = payload
+                    archived.setdefault(archive, []).extend(entries)
+                else:
+                    failed.append(payload)
+                if batch_started is None:
+                    batch_started = time.monotonic()
+            waiting = len(rows) + len(watermarks) + len(failed) + len(skipped) + sum(len(entries) for entries in archived.values())
+            if waiting and (stopping or waiting >= self.batch_size or time.monotonic() - batch_started >= self.flush_interval):
+                self._flush_with_retry(conn, rows, watermarks, failed, skipped)
+                for archive, entries in archived.items():
+                    try:
+                        archive.write(entries)
+                    except (OSError, sqlite3.Error) as e:
+                        logger.error(f"Writer failed to archive {len(entries)} payloads: {e}")
+                rows, watermarks, failed, skipped, archived = [], [], [], [], {}
+                batch_started = None
+            now = time.monotonic()
+            if now - last_report >= REPORT_INTERVAL:
+                logger.info(f"Writer: {(self.rows_written - reported_rows) / (now - last_report):.1f} rows/s, queue depth {self.queue.qsize()}")
+                last_report, reported_rows = now, self.rows_written
+        conn.close()
+
+    def _flush_with_retry(self, conn, rows, watermarks, failed, skipped):
+        """
+        Commit a batch, retrying with backoff (e.g. while another process holds the database).
+        A batch that still fails is given up: its matches and watermarks are forgotten, so the
+        crawl fetches and lists them again instead of taking them as stored.
+        """
+        writes = len(rows) + len(watermarks) + len(failed) + len(skipped)
+        delay = FLUSH_BACKOFF
+        for attempt in range(1, FLUSH_ATTEMPTS + 1):
+            try:
+                self._flush(conn, rows, watermarks, failed, skipped)
+                return
+            except sqlite3.Error as e:
+                if attempt == FLUSH_ATTEMPTS:
+                    logger.error(f"Writer gave up on {writes} writes after {attempt} attempts: {e}")
+                else:
+                    logger.warning(f"Writer failed to commit {writes} writes ({e}); retrying in {delay:.1f}s.")
+                    time.sleep(delay)
+                    delay *= 2
+        with self._lock:
+            for entry in rows + failed + skipped:
+                self.known_matches.discard(entry[0])
+            for puuid, last_start_time, _ in watermarks:
+                if self.watermarks.get(puuid) == last_start_time:
+                    del self.watermarks[puuid]
+
+    def _flush(self, conn, rows, watermarks, failed, skipped):
+        with conn:
+            conn.executemany(INSERT_OR_IGNORE_MATCH_RECORD_SQL, rows)
+            conn.executemany(SET_WATERMARK_SQL, watermarks)
+            conn.executemany(ADD_FAILED_MATCH_SQL, failed)
+            conn.executemany(ADD_SKIPPED_MATCH_SQL, skipped)
+        self.rows_written += len(rows)
+
+    def close(self):
+        """
+        Flush everything queued and stop the writer thread.
+        """
+        self.queue.put(_STOP)
+        self._thread.join()
+        logger.info(f"Writer: {self.rows_written} rows written.")
+
+_writer_config = {}
+_writer = None
+_writer_lock = threading.Lock()
+
+def configure_writer(db_path=None, batch_size=None, flush_interval=None, max_queue=None):
+    """
+    Settings for the writer started by get_writer(); call before the crawl starts.
+    """
+    overrides = {"db_path": db_path, "batch_size": batch_size, "flush_interval": flush_interval, "max_queue": max_queue}
+    _writer_config.update({key: value for key, value in overrides.items() if value is not None})
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MatchWriter(**_writer_config)
+        return _writer
+
+def close_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "core", "pipeline"))
+from rate_limiter import AdaptiveRateLimiter, SharedRateLimitStore
+
+LIMITS = ((10, 1),)
+DURATION = 2.5
+SLACK = 0.05  # admission time vs. when the caller got to record it
+
+def crawl(db_path, start, duration, calls):
+    # Built after the first process saved the window: its period comes back from SQLite as 1.0
+    limiter = AdaptiveRateLimiter(LIMITS, store=SharedRateLimitStore(db_path), name="americas:app")
+    while time.time() < start:
+        time.sleep(0.01)
+    while time.time() < start + duration:
+        limiter.acquire()
+        calls.append(time.time())
+
+def busiest_second(calls):
+    calls = sorted(calls)
+    return max(sum(1 for t in calls[i:] if t - first < 1 - SLACK) for i, first in enumerate(calls))
+
+def test_processes_share_one_budget(tmp_path):
+    db_path = str(tmp_path / "rate_limits.db")
+    parent = AdaptiveRateLimiter(LIMITS, store=SharedRateLimitStore(db_path), name="americas:app")
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    child_calls = manager.list()
+    start = time.time() + 3  # time for the child to start up
+    child = context.Process(target=crawl, args=(db_path, start, DURATION, child_calls))
+    child.start()
+    parent_calls = []
+    while time.time() < start:
+        time.sleep(0.01)
+    while time.time() < start + DURATION:
+        parent.acquire()
+        parent_calls.append(time.time())
+    child.join(timeout=30)
+    calls = parent_calls + list(child_calls)
+    assert child_calls and parent_calls
+    assert busiest_second(calls) <= LIMITS[0][0]
@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+import random
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "core", "pipeline"))
+from timeline_stream import decode_timeline_events
+from data_parser import group_item_events
+
+TIMELINE_PATH = os.path.join(os.path.dirname(__file__), "timeline.json")
+
+@pytest.fixture(scope="module")
+def timeline_bytes():
+    with open(TIMELINE_PATH, "rb") as f:
+        return f.read()
+
+@pytest.fixture(scope="module")
+def short_timeline_bytes(timeline_bytes):
+    # The first frames only: byte-sized chunks of the whole file take too long
+    timeline = json.loads(timeline_bytes)
+    timeline["info"]["frames"] = timeline["info"]["frames"][:4]
+    return json.dumps(timeline).encode("utf-8")
+
+def chunked(data, size):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+def randomly_chunked(data, seed, max_size=4096):
+    rng = random.Random(seed)
+    pos = 0
+    while pos < len(data):
+        size = rng.randint(1, max_size)
+        yield data[pos:pos + size]
+        pos += size
+
+@pytest.mark.parametrize("size", [1, 2, 7])
+def test_tiny_chunks(short_timeline_bytes, size):
+    expected = group_item_events(json.loads(short_timeline_bytes))
+    assert expected
+    assert group_item_events(decode_timeline_events(chunked(short_timeline_bytes, size))) == expected
+
+@pytest.mark.parametrize("size", [61, 1024, 64 * 1024, None])
+def test_streamed_item_events_match_full_decode(timeline_bytes, size):
+    expected = group_item_events(json.loads(timeline_bytes))
+    streamed = decode_timeline_events(chunked(timeline_bytes, size or len(timeline_bytes)))
+    assert group_item_events(streamed) == expected
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_chunks(timeline_bytes, seed):
+    expected = group_item_events(json.loads(timeline_bytes))
+    assert group_item_events(decode_timeline_events(randomly_chunked(timeline_bytes, seed))) == expected
+
+def test_pretty_printed_utf8(timeline_bytes):
+    timeline = json.loads(timeline_bytes)
+    # Multi-byte characters cut between chunks, and whitespace around every token
+    timeline["metadata"] = {"note": "žádný – 名前 ✓"}
+    for frame in timeline["info"]["frames"]:
+        for event in frame["events"]:
+            if event.get("type") == "ITEM_PURCHASED":
+                event["note"] = "ö✓"
+    data = json.dumps(timeline, indent=2, ensure_ascii=False).encode("utf-8")
+    streamed = decode_timeline_events(randomly_chunked(data, seed=42, max_size=97))
+    assert group_item_events(streamed) == group_item_events(timeline)
+    assert all(event["note"] == "ö✓" for event in streamed["info"]["frames"][0]["events"] if event["type"] == "ITEM_PURCHASED")